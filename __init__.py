@@ -13,11 +13,14 @@ NODE_CLASS_MAPPINGS = {
     "MaskListSplitter": MaskListSplitter,
     "ImageListRepeater": ImageListRepeater,
     "MaskListRepeater": MaskListRepeater,
+    "LG_ImageChunker": LG_ImageChunker,
+    "LG_ChunkReceiver": LG_ChunkReceiver,
     "LG_FastPreview": LG_FastPreview,
     "LG_AccumulatePreview": LG_AccumulatePreview,
     "LG_CreateAndSaveVideo": LG_CreateAndSaveVideo,
     "LG_ConcatVideoFiles": LG_ConcatVideoFiles,
     "LG_SaveAudioGetPath": LG_SaveAudioGetPath,
+    "LG_FinalizeVideoStream": LG_FinalizeVideoStream,
     "LG_ValueSender": LG_ValueSender,
     "LG_ValueReceiver": LG_ValueReceiver,
     "LG_ClearAccumulatedValues": LG_ClearAccumulatedValues,
@@ -32,11 +35,14 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "MaskListSplitter": "🎈List-Mask-Splitter",
     "ImageListRepeater": "🎈List-Image-Repeater",
     "MaskListRepeater": "🎈List-Mask-Repeater",
+    "LG_ImageChunker": "🎈LG_ImageChunker",
+    "LG_ChunkReceiver": "🎈LG_ChunkReceiver",
     "LG_FastPreview": "🎈LG_FastPreview",
     "LG_AccumulatePreview": "🎈LG_AccumulatePreview",
     "LG_CreateAndSaveVideo": "🎈LG_CreateAndSaveVideo",
     "LG_ConcatVideoFiles": "🎈LG_ConcatVideoFiles",
     "LG_SaveAudioGetPath": "🎈LG_SaveAudioGetPath",
+    "LG_FinalizeVideoStream": "🎈LG_FinalizeVideoStream",
     "LG_ValueSender": "🎈LG_ValueSender",
     "LG_ValueReceiver": "🎈LG_ValueReceiver",
     "LG_ClearAccumulatedValues": "🎈LG_ClearAccumulatedValues",
@@ -0,0 +1,95 @@
+"""
+LG_SaveAudioGetPath 批量导出基准
+生成合成多声道波形，比较旧的逐条编码（先写入 BytesIO 再落盘）与新的并行直写实现的耗时，
+并检查两者输出的文件数量与解码后的采样数一致
+
+用法: python benchmarks/bench_audio_export.py [--batch 1,4,8] [--seconds 10] [--format flac]
+"""
+
+import argparse
+import os
+from io import BytesIO
+
+import av
+
+from common import load, print_table, synthetic_audio, timeit, work_dir
+
+
+def legacy_export(audio, output_dir, format, quality="128k"):
+    """旧实现：逐条编码到 BytesIO，再整体写入文件"""
+    bit_rates = {"64k": 64000, "96k": 96000, "128k": 128000, "192k": 192000, "320k": 320000}
+    sample_rate = audio["sample_rate"]
+    paths = []
+    for i, waveform in enumerate(audio["waveform"].cpu()):
+        output_buffer = BytesIO()
+        container = av.open(output_buffer, mode="w", format=format)
+        layout = "mono" if waveform.shape[0] == 1 else "stereo"
+        if format == "mp3":
+            stream = container.add_stream("libmp3lame", rate=sample_rate, layout=layout)
+            stream.bit_rate = bit_rates[quality]
+        elif format == "opus":
+            stream = container.add_stream("libopus", rate=sample_rate, layout=layout)
+            stream.bit_rate = bit_rates[quality]
+        else:
+            stream = container.add_stream("flac", rate=sample_rate, layout=layout)
+        frame = av.AudioFrame.from_ndarray(
+            waveform.movedim(0, 1).reshape(1, -1).float().numpy(), format="flt", layout=layout
+        )
+        frame.sample_rate = sample_rate
+        frame.pts = 0
+        container.mux(stream.encode(frame))
+        container.mux(stream.encode(None))
+        container.close()
+        path = os.path.join(output_dir, f"legacy_{i:05}.{format}")
+        with open(path, "wb") as f:
+            f.write(output_buffer.getbuffer())
+        paths.append(path)
+    return paths
+
+
+def decoded_samples(path):
+    with av.open(path) as container:
+        return sum(frame.samples for frame in container.decode(audio=0))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", default="1,4,8", help="逗号分隔的批次大小")
+    parser.add_argument("--seconds", type=float, default=10, help="每条音频的秒数")
+    parser.add_argument("--sample-rate", type=int, default=48000, help="采样率（opus 需为其支持的采样率，基准不做重采样）")
+    parser.add_argument("--format", default="flac", choices=("flac", "mp3", "opus"), help="输出格式")
+    parser.add_argument("--repeat", type=int, default=1, help="每种批次重复次数，取最快一次")
+    opts = parser.parse_args()
+
+    batch_video = load("batch_video")
+    node = batch_video.LG_SaveAudioGetPath()
+    legacy_dir = os.path.join(work_dir(), "legacy_audio")
+    os.makedirs(legacy_dir, exist_ok=True)
+    print(f"{opts.seconds:g} 秒 {opts.sample_rate} Hz 立体声 {opts.format}，CPU 核数 {os.cpu_count()}")
+
+    rows = []
+    for batch in [int(b) for b in opts.batch.split(",")]:
+        audio = synthetic_audio(opts.seconds, opts.sample_rate, batch=batch)
+        outputs = []
+
+        def parallel():
+            outputs.append(node.save_audio(f"bench/audio_{batch}", opts.format, audio)["result"][1])
+
+        t_legacy = timeit(lambda: legacy_export(audio, legacy_dir, opts.format), opts.repeat)
+        t_new = timeit(parallel, opts.repeat)
+        paths = outputs[-1]
+        assert len(paths) == batch, (batch, paths)
+        old = decoded_samples(os.path.join(legacy_dir, f"legacy_00000.{opts.format}"))
+        new = decoded_samples(paths[0])
+        assert old == new, (batch, old, new)
+        rows.append((
+            batch, new,
+            f"{sum(os.path.getsize(p) for p in paths) / 1024:.0f}",
+            f"{t_legacy * 1000:.0f}", f"{t_new * 1000:.0f}", f"{t_legacy / t_new:.2f}x",
+        ))
+
+    print_table(("batch", "samples", "output KB", "legacy ms", "parallel ms", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+py/batch_video.py 视频/音频流程基准
+在本地生成合成图像与波形，分别运行：
+1. LG_CreateAndSaveVideo：不同分辨率 × 段数，另含 segments=1、default 编码参数的单进程管道编码作为基线
+2. LG_ConcatVideoFiles：复制 / 重编码 × 无音频 / replace / mix
+3. LG_SaveAudioGetPath：不同格式 × 时长
+每个用例在独立子进程中执行，记录耗时、Python 进程峰值 RSS、ffmpeg 等子进程的峰值 RSS 与输出字节数，
+并写入 JSON 报告用于回归对比。
+子进程 RSS 有两列：RUSAGE_CHILDREN 的 ru_maxrss（Linux 上 exec 时会继承父进程当时的 RSS，不会低于本进程），
+以及在 Linux 上轮询 /proc 中各子进程 VmHWM 得到的 ffmpeg 自身峰值（存活不足一个采样间隔的子进程可能漏采）。
+folder_paths 等 ComfyUI 模块由 common.py 的替身提供，不需要 ComfyUI 服务端（需要 PATH 中有 ffmpeg）
+
+用法: python benchmarks/bench_batch_video.py [--sizes 320x180,640x360,1280x720] [--frames 96]
+      [--audio-seconds 10,60] [--report bench_batch_video.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+from common import load, print_table, synthetic_audio, work_dir, write_report
+
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # Linux 上 ru_maxrss 单位为 KB，macOS 为字节；RUSAGE_CHILDREN 为已结束子进程中最大的峰值
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class ChildPeakSampler:
+    """后台线程定期读取全部子孙进程的 VmHWM（仅 Linux），记录其中的最大值（MB）"""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self.supported = os.path.exists(f"/proc/{os.getpid()}/task")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        if self.supported:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self.supported:
+            self._thread.join()
+
+    @staticmethod
+    def _children(pid):
+        children = []
+        try:
+            for tid in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{tid}/children") as f:
+                    children.extend(int(c) for c in f.read().split())
+        except OSError:
+            pass
+        return children
+
+    def _sample(self):
+        pending = self._children(os.getpid())
+        while pending:
+            pid = pending.pop()
+            pending.extend(self._children(pid))
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmHWM:"):
+                            self.peak_mb = max(self.peak_mb, int(line.split()[1]) / 1024)
+                            break
+            except OSError:
+                pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+
+def setup_video(case):
+    from bench_video_segments import synthetic_frames
+
+    images = synthetic_frames(case["frames"], case["width"], case["height"])
+    node = load("batch_video").LG_CreateAndSaveVideo()
+    encoder = {k: case[k] for k in ("preset", "crf") if k in case}
+    return lambda: [node.create_and_save(images, case["fps"], "bench/video", segments=case["segments"],
+                                         encoder_profile=case["profile"], **encoder)[0]]
+
+
+def setup_concat(case):
+    from bench_video_segments import synthetic_frames
+
+    batch_video = load("batch_video")
+    video_node = batch_video.LG_CreateAndSaveVideo()
+    clip_audio = synthetic_audio(case["clip_frames"] / case["fps"])
+    clips = [
+        video_node.create_and_save(synthetic_frames(case["clip_frames"], case["width"], case["height"], seed=i),
+                                   case["fps"], "bench/clip", audio=clip_audio, encoder_profile="fast_draft")[0]
+        for i in range(case["clips"])
+    ]
+    audio_path = None
+    if case["audio_mode"] != "none":
+        seconds = case["clips"] * case["clip_frames"] / case["fps"]
+        audio_path = batch_video.LG_SaveAudioGetPath().save_audio(
+            "bench/music", "flac", synthetic_audio(seconds, seed=1))["result"][0]
+    node = batch_video.LG_ConcatVideoFiles()
+    return lambda: [node.concat_files(
+        [clips], ["bench/concat"], [case["reencode"]], [audio_path] if audio_path else None,
+        [case["audio_mode"] if audio_path else "replace"], [0.8],
+        encoder_profile=[case["profile"]],
+    )["result"][0]]
+
+
+def setup_audio(case):
+    audio = synthetic_audio(case["seconds"], batch=case["batch"])
+    node = load("batch_video").LG_SaveAudioGetPath()
+    return lambda: node.save_audio("bench/audio", case["format"], audio)["result"][1]
+
+
+SETUPS = {"video": setup_video, "concat": setup_concat, "audio": setup_audio}
+
+
+def run_case(case):
+    """子进程内执行：准备输入（不计时）后运行一次节点"""
+    fn = SETUPS[case["kind"]](case)
+    rss_before = peak_rss_mb()
+    with ChildPeakSampler() as sampler:
+        start = time.perf_counter()
+        outputs = fn()
+        elapsed = time.perf_counter() - start
+    rss_peak = peak_rss_mb()
+    result = {
+        "seconds": round(elapsed, 4),
+        "peak_rss_mb": round(rss_peak, 1),
+        "rss_growth_mb": round(rss_peak - rss_before, 1),
+        "children_maxrss_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        "ffmpeg_peak_rss_mb": round(sampler.peak_mb, 1) if sampler.supported else None,
+        "output_bytes": sum(os.path.getsize(p) for p in outputs if p and os.path.exists(p)),
+        "outputs": len(outputs),
+    }
+    shutil.rmtree(work_dir(), ignore_errors=True)
+    print(RESULT_PREFIX + json.dumps(result))
+
+
+def spawn(case):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)],
+                          capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    return {"error": (proc.stderr or proc.stdout).strip().splitlines()[-1:] or ["未知错误"]}
+
+
+def build_cases(opts):
+    cases = []
+    sizes = [tuple(int(v) for v in s.split("x")) for s in opts.sizes.split(",")]
+    for width, height in sizes:
+        # 基线：default 的参数（medium, crf 23）走 segments=1 的单进程管道编码；default 本身的单段路径需要 comfy_api
+        cases.append({"kind": "video", "name": f"video {width}x{height} seg=1 default pipe", "width": width,
+                      "height": height, "frames": opts.frames, "fps": opts.fps, "segments": 1,
+                      "profile": "custom", "preset": "medium", "crf": 23})
+        for segments in [int(s) for s in opts.segments.split(",")]:
+            cases.append({"kind": "video", "name": f"video {width}x{height} seg={segments}", "width": width,
+                          "height": height, "frames": opts.frames, "fps": opts.fps, "segments": segments,
+                          "profile": opts.profile})
+    width, height = sizes[0]
+    for audio_mode in ("none", "replace", "mix"):
+        for reencode in (False, True):
+            cases.append({"kind": "concat", "name": f"concat {'reencode' if reencode else 'copy'} {audio_mode}",
+                          "width": width, "height": height, "fps": opts.fps, "clips": opts.clips,
+                          "clip_frames": opts.frames, "reencode": reencode, "audio_mode": audio_mode,
+                          "profile": opts.profile})
+    for fmt in ("flac", "mp3", "opus"):
+        for seconds in [float(s) for s in opts.audio_seconds.split(",")]:
+            cases.append({"kind": "audio", "name": f"audio {fmt} {seconds:g}s x{opts.audio_batch}",
+                          "format": fmt, "seconds": seconds, "batch": opts.audio_batch})
+    return cases
+
+
+def ffmpeg_version():
+    try:
+        out = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout
+        return out.splitlines()[0] if out else None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="320x180,640x360,1280x720", help="逗号分隔的视频分辨率")
+    parser.add_argument("--frames", type=int, default=96, help="每段视频的帧数")
+    parser.add_argument("--fps", type=float, default=24.0, help="帧率")
+    parser.add_argument("--segments", default="1,2", help="LG_CreateAndSaveVideo 的段数，逗号分隔")
+    parser.add_argument("--profile", default="fast_draft", help="编码预设（default 的单段路径需要 comfy_api）")
+    parser.add_argument("--clips", type=int, default=4, help="拼接用例的片段数量")
+    parser.add_argument("--audio-seconds", default="10,60", help="音频用例的时长（秒），逗号分隔")
+    parser.add_argument("--audio-batch", type=int, default=2, help="音频用例的批次大小")
+    parser.add_argument("--only", default="", help="只运行名称包含该文本的用例")
+    parser.add_argument("--report", default="bench_batch_video.json", help="JSON 报告路径")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+
+    if opts.case:
+        run_case(json.loads(opts.case))
+        return
+
+    cases = [c for c in build_cases(opts) if opts.only in c["name"]]
+    rows = []
+    for case in cases:
+        case["result"] = spawn(case)
+        r = case["result"]
+        if "error" in r:
+            rows.append((case["name"], "error", "", "", "", "", r["error"][0][:60]))
+        else:
+            rows.append((case["name"], f"{r['seconds'] * 1000:.0f}", f"{r['peak_rss_mb']:.0f}",
+                         f"{r['rss_growth_mb']:.0f}", f"{r['children_maxrss_mb']:.0f}",
+                         "" if r["ffmpeg_peak_rss_mb"] is None else f"{r['ffmpeg_peak_rss_mb']:.0f}",
+                         f"{r['output_bytes'] / 1024:.0f}"))
+        print(*rows[-1], sep="  ", flush=True)
+
+    print()
+    print_table(("case", "ms", "peak RSS MB", "RSS growth MB", "children maxrss MB", "ffmpeg peak RSS MB",
+                 "output KB"), rows)
+    write_report(opts.report, {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ffmpeg": ffmpeg_version(),
+        },
+        "options": {k: v for k, v in vars(opts).items() if k != "case"},
+        "cases": cases,
+    })
+
+
+if __name__ == "__main__":
+    main()
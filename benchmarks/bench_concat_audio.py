@@ -0,0 +1,151 @@
+"""
+LG_ConcatVideoFiles 单次拼接对比
+用 ffmpeg 生成带音轨的合成片段和一段外部音频，在 无音频 / replace / mix × 复制 / 重编码 组合下，
+比较旧的多次 ffmpeg 调用实现与新的单次命令：输出的帧数、时长、音轨，以及耗时（需要 PATH 中有 ffmpeg）
+
+用法: python benchmarks/bench_concat_audio.py [--clips 4] [--duration 3] [--size 640x360]
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import subprocess
+import tempfile
+
+from common import load, print_table, timeit, work_dir
+
+
+def run(cmd):
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg 错误:\n{result.stderr}")
+    return result
+
+
+def legacy_concat(paths, output_file, reencode=False, audio_path=None, audio_mode="replace", audio_volume=1.0):
+    """旧实现：有音频时先拼接出不含音频的临时视频，mix 模式再拼接一次带原音频的临时视频，最后合入音频"""
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+        for p in paths:
+            escaped_path = p.replace("'", "'\\''")
+            f.write(f"file '{escaped_path}'\n")
+        concat_file = f.name
+
+    x264 = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '23']
+    concat_in = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file]
+    try:
+        if not audio_path:
+            if reencode:
+                run(concat_in + x264 + ['-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart', output_file])
+            else:
+                run(concat_in + ['-c', 'copy', '-movflags', '+faststart', output_file])
+            return
+
+        temp_video = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
+        try:
+            video_args = x264 if reencode else ['-c:v', 'copy']
+            run(concat_in + video_args + ['-an', '-movflags', '+faststart', temp_video])
+            if audio_mode == "mix":
+                temp_video_with_audio = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
+                try:
+                    audio_args = x264 + ['-c:a', 'aac', '-b:a', '128k'] if reencode else ['-c', 'copy']
+                    run(concat_in + audio_args + ['-movflags', '+faststart', temp_video_with_audio])
+                    run([
+                        'ffmpeg', '-y', '-i', temp_video_with_audio, '-i', audio_path,
+                        '-filter_complex',
+                        f'[0:a][1:a]amix=inputs=2:duration=first:dropout_transition=2,volume={audio_volume}[a]',
+                        '-map', '0:v', '-map', '[a]', '-c:v', 'copy', '-c:a', 'aac', '-b:a', '128k',
+                        '-movflags', '+faststart', '-shortest', output_file,
+                    ])
+                finally:
+                    os.unlink(temp_video_with_audio)
+            else:
+                cmd = ['ffmpeg', '-y', '-i', temp_video, '-i', audio_path, '-map', '0:v', '-map', '1:a', '-c:v', 'copy']
+                if audio_volume != 1.0:
+                    cmd.extend(['-af', f'volume={audio_volume}'])
+                run(cmd + ['-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart', '-shortest', output_file])
+        finally:
+            os.unlink(temp_video)
+    finally:
+        os.unlink(concat_file)
+
+
+def make_inputs(directory, clips, duration, size):
+    paths = []
+    for i in range(clips):
+        path = os.path.join(directory, f"clip_{i}.mp4")
+        run([
+            'ffmpeg', '-y', '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate=24:duration={duration}',
+            '-f', 'lavfi', '-i', f'sine=frequency={220 * (i + 1)}:duration={duration}',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-shortest', path,
+        ])
+        paths.append(path)
+    audio_path = os.path.join(directory, "music.wav")
+    run(['ffmpeg', '-y', '-f', 'lavfi', '-i', f'sine=frequency=880:duration={clips * duration}', audio_path])
+    return paths, audio_path
+
+
+def probe(path):
+    """不依赖 ffprobe：解码一遍统计视频帧数、时长和音轨数，并计算视频流的 md5"""
+    stderr = subprocess.run(['ffmpeg', '-i', path, '-map', '0', '-f', 'null', '-'],
+                            capture_output=True, text=True).stderr
+    frames = re.findall(r"frame=\s*(\d+)", stderr)
+    times = re.findall(r"time=(\d+):(\d+):([\d.]+)", stderr)
+    h, m, sec = times[-1] if times else (0, 0, 0)
+    video = subprocess.run(['ffmpeg', '-i', path, '-map', '0:v', '-c', 'copy', '-f', 'md5', '-'],
+                           capture_output=True, text=True).stdout.strip()
+    return {
+        "frames": int(frames[-1]) if frames else 0,
+        "duration": int(h) * 3600 + int(m) * 60 + float(sec),
+        "audio_streams": len(re.findall(r"Stream #0:\d+.*: Audio", stderr.split("Output #0")[0])),
+        "video_md5": hashlib.md5(video.encode()).hexdigest()[:8],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=4, help="片段数量")
+    parser.add_argument("--duration", type=float, default=3, help="每个片段的秒数")
+    parser.add_argument("--size", default="640x360", help="片段分辨率")
+    parser.add_argument("--repeat", type=int, default=1, help="每种组合重复次数，取最快一次")
+    opts = parser.parse_args()
+
+    batch_video = load("batch_video")
+    directory = os.path.join(work_dir(), "concat_inputs")
+    os.makedirs(directory, exist_ok=True)
+    paths, audio_path = make_inputs(directory, opts.clips, opts.duration, opts.size)
+    node = batch_video.LG_ConcatVideoFiles()
+
+    rows = []
+    for audio_mode in ("none", "replace", "mix"):
+        for reencode in (False, True):
+            audio = None if audio_mode == "none" else audio_path
+            legacy_out = os.path.join(work_dir(), f"legacy_{audio_mode}_{int(reencode)}.mp4")
+            outputs = []
+
+            def legacy():
+                legacy_concat(paths, legacy_out, reencode, audio, audio_mode, 0.8)
+
+            def single_pass():
+                result = node.concat_files([paths], ["bench/concat"], [reencode],
+                                           [audio] if audio else None, [audio_mode], [0.8])
+                outputs.append(result["result"][0])
+
+            t_legacy = timeit(legacy, opts.repeat)
+            t_new = timeit(single_pass, opts.repeat)
+            old, new = probe(legacy_out), probe(outputs[-1])
+            assert old["frames"] == new["frames"], (audio_mode, reencode, old, new)
+            assert abs(old["duration"] - new["duration"]) < 0.1, (audio_mode, reencode, old, new)
+            assert old["audio_streams"] == new["audio_streams"], (audio_mode, reencode, old, new)
+            rows.append((
+                audio_mode, "reencode" if reencode else "copy",
+                new["frames"], f"{new['duration']:.2f}",
+                "yes" if old["video_md5"] == new["video_md5"] else "no",
+                f"{t_legacy * 1000:.0f}", f"{t_new * 1000:.0f}", f"{t_legacy / t_new:.2f}x",
+            ))
+
+    print_table(("audio", "video", "frames", "seconds", "same video", "legacy ms", "single ms", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+LG_ConcatVideoFiles 兼容性转换检查
+用 LG_CreateAndSaveVideo 以不同编码配置生成片段（如 fast_draft 参考片段 + default 片段），
+检查 conform_segments 转换后所有片段的参数集（avcC）与参考完全一致、拼接结果帧数正确且画面可解码，
+并比较“只转换不一致片段”与整体重新编码的耗时（需要 PATH 中有 ffmpeg / ffprobe）
+
+用法: python benchmarks/bench_concat_compat.py [--frames 48] [--size 320x180]
+"""
+
+import argparse
+import os
+import tempfile
+
+import av
+import numpy as np
+
+from bench_video_segments import synthetic_frames
+from common import load, print_table, timeit, work_dir
+
+# (参考片段配置, 不一致片段配置)；配置为 LG_CreateAndSaveVideo 的编码参数，segments=2 时走 default 设置的管道编码
+CASES = [
+    ("fast_draft", "default"),
+    ("default", "fast_draft"),
+    ("fast_draft", "default_resized"),
+    ("veryfast", "default"),
+    ("default", "animation_crf30"),
+]
+
+PROFILES = {
+    "fast_draft": {"encoder_profile": "fast_draft"},
+    "default": {"segments": 2},
+    "default_resized": {"segments": 2, "resize": 16},
+    "veryfast": {"encoder_profile": "custom", "preset": "veryfast"},
+    "animation_crf30": {"encoder_profile": "custom", "tune": "animation", "crf": 30},
+}
+
+
+def make_clip(node, name, profile, frames, width, height, seed):
+    kwargs = dict(PROFILES[profile])
+    height -= kwargs.pop("resize", 0)
+    return node.create_and_save(synthetic_frames(frames, width, height, seed=seed), 24.0, f"compat/{name}",
+                                **kwargs)[0]
+
+
+def extradata(path):
+    with av.open(path) as container:
+        return bytes(container.streams.video[0].codec_context.extradata)
+
+
+def decode(path):
+    with av.open(path) as container:
+        return [frame.to_ndarray(format="rgb24").astype(np.float32) for frame in container.decode(video=0)]
+
+
+def psnr(a, b):
+    """a 为转换后的帧，尺寸不同时（缩放后居中填充）只比较中间与 b 对应的区域"""
+    top, left = (a.shape[0] - b.shape[0]) // 2, (a.shape[1] - b.shape[1]) // 2
+    a = a[top:top + b.shape[0], left:left + b.shape[1]]
+    return 10 * np.log10(255.0 ** 2 / max(float(((a - b) ** 2).mean()), 1e-9))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=48, help="每个片段的帧数")
+    parser.add_argument("--size", default="320x180", help="参考片段分辨率")
+    opts = parser.parse_args()
+    width, height = (int(v) for v in opts.size.split("x"))
+
+    batch_video = load("batch_video")
+    ffmpeg_utils = load("ffmpeg_utils")
+    video_node = batch_video.LG_CreateAndSaveVideo()
+    concat_node = batch_video.LG_ConcatVideoFiles()
+
+    rows = []
+    for reference, other in CASES:
+        name = f"{reference}+{other}"
+        paths = [make_clip(video_node, name, reference, opts.frames, width, height, seed=i) for i in range(2)]
+        paths.append(make_clip(video_node, name, other, opts.frames, width, height, seed=9))
+        assert extradata(paths[0]) != extradata(paths[2]), f"{name}: 测试片段的参数集应不同"
+
+        with tempfile.TemporaryDirectory(dir=work_dir()) as directory:
+            conformed = ffmpeg_utils.conform_segments(paths, directory, ffmpeg_utils.resolve_encoder())
+            assert conformed is not None, f"{name}: 无法按参考参数转换"
+            new_paths, converted = conformed
+            assert converted == 1, (name, converted)
+            assert len({extradata(p) for p in new_paths}) == 1, f"{name}: 转换后参数集不一致"
+            quality = min(psnr(a, b) for a, b in zip(decode(new_paths[2]), decode(paths[2])))
+
+        outputs = {}
+
+        def run(reencode):
+            outputs[reencode] = concat_node.concat_files([paths], [f"compat/{name}_out"], [reencode])["result"][0]
+
+        t_conform = timeit(lambda: run(False), 1)
+        t_full = timeit(lambda: run(True), 1)
+        frames = decode(outputs[False])
+        assert len(frames) == 3 * opts.frames, (name, len(frames))
+        assert extradata(outputs[False]) == extradata(paths[0]), f"{name}: 输出参数集与参考不一致"
+        rows.append((name, converted, f"{quality:.1f}", len(frames),
+                     f"{t_conform * 1000:.0f}", f"{t_full * 1000:.0f}", f"{t_full / t_conform:.2f}x"))
+
+    print_table(("case", "converted", "min PSNR dB", "frames", "conform ms", "full reencode ms", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
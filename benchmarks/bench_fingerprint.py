@@ -0,0 +1,54 @@
+"""
+LG_ImageSender.IS_CHANGED 指纹开销基准
+对比旧实现 hash(str(images) + str(masks)) 与新的 fingerprint()（首次 / 命中缓存 / 采样）随批量大小的耗时
+
+用法: python benchmarks/bench_fingerprint.py [--size 512] [--batches 1,4,16,64]
+"""
+
+import argparse
+
+import torch
+
+from common import load, print_table, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=512, help="图像边长")
+    parser.add_argument("--batches", default="1,4,16,64", help="逗号分隔的批量大小")
+    parser.add_argument("--sample-mb", type=float, default=4.0, help="采样模式的采样字节数 (MB)")
+    opts = parser.parse_args()
+
+    fp = load("fingerprint")
+    sample_bytes = int(opts.sample_mb * 1024 * 1024)
+
+    rows = []
+    for batch in [int(b) for b in opts.batches.split(",") if b.strip()]:
+        images = [torch.rand(batch, opts.size, opts.size, 3)]
+        masks = [torch.rand(batch, opts.size, opts.size)]
+
+        t_str = timeit(lambda: hash(str(images) + str(masks)))
+
+        def cold():
+            fp._cache.clear()
+            fp.fingerprint(images, masks)
+
+        t_cold = timeit(cold)
+        fp.fingerprint(images, masks)
+        t_warm = timeit(lambda: fp.fingerprint(images, masks))
+
+        def sampled():
+            fp._cache.clear()
+            fp.fingerprint(images, masks, sample_bytes=sample_bytes)
+
+        t_sampled = timeit(sampled)
+
+        mb = (images[0].numel() + masks[0].numel()) * 4 / 1024 / 1024
+        rows.append((batch, f"{mb:.1f}", f"{t_str * 1000:.2f}", f"{t_cold * 1000:.2f}",
+                     f"{t_warm * 1000:.3f}", f"{t_sampled * 1000:.2f}"))
+
+    print_table(("batch", "MB", "str+hash ms", "blake2b ms", "cached ms", "sampled ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+LG_ImageReceiver 解码基准
+生成一批 RGBA PNG（与 LG_ImageSender 写出的格式一致），对比旧的逐张 split/merge 解码与新的并行解码（列表 / 批量输出）
+新实现分别报告冷缓存（每次计时前清空解码缓存，反映真实解码开销）与热缓存（重复读取同一批文件）两种情况
+
+用法: python benchmarks/bench_image_receiver.py [--count 120] [--size 512]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import torch
+from PIL import Image
+
+from common import load, print_table, timeit
+
+
+def legacy_load(temp_dir, image_files):
+    """旧实现：逐张解码，split/merge 后分别做两次浮点转换"""
+    output_images, output_masks = [], []
+    for img_file in image_files:
+        img = Image.open(os.path.join(temp_dir, img_file))
+        r, g, b, a = img.split()
+        rgb_image = Image.merge('RGB', (r, g, b))
+        image = torch.from_numpy(np.array(rgb_image).astype(np.float32) / 255.0)[None,]
+        mask = 1.0 - torch.from_numpy(np.array(a).astype(np.float32) / 255.0)[None,]
+        output_images.append(image)
+        output_masks.append(mask)
+    return output_images, output_masks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=120, help="图像数量")
+    parser.add_argument("--size", type=int, default=512, help="图像边长")
+    opts = parser.parse_args()
+
+    trans = load("trans")
+    import folder_paths
+
+    temp_dir = folder_paths.get_temp_directory()
+    rng = np.random.default_rng(0)
+    files = []
+    for i in range(opts.count):
+        data = rng.integers(0, 256, size=(opts.size, opts.size, 4), dtype=np.uint8)
+        name = f"bench_recv_{i}.png"
+        Image.fromarray(data, "RGBA").save(os.path.join(temp_dir, name), compress_level=1)
+        files.append(name)
+
+    receiver = trans.LG_ImageReceiver()
+    image_arg = ", ".join(files)
+
+    legacy_images, legacy_masks = legacy_load(temp_dir, files)
+    new_images, new_masks = receiver.load_image(image_arg, 1)
+    assert all(torch.equal(a, b) for a, b in zip(legacy_images, new_images))
+    assert all(torch.allclose(a, b) for a, b in zip(legacy_masks, new_masks))
+
+    # 输出的张量不能与缓存共享，下游原地修改不应影响后续读取
+    new_images[0].mul_(0)
+    assert torch.equal(receiver.load_image(image_arg, 1)[0][0], legacy_images[0])
+
+    cache = trans._decoded_image_cache
+
+    def cold(output_batch):
+        cache.clear()
+        return receiver.load_image(image_arg, 1, output_batch=output_batch)
+
+    t_legacy = timeit(lambda: legacy_load(temp_dir, files))
+    timings = [
+        ("threaded list (cold cache)", timeit(lambda: cold(False))),
+        ("threaded batch (cold cache)", timeit(lambda: cold(True))),
+        ("threaded list (warm cache)", timeit(lambda: receiver.load_image(image_arg, 1))),
+        ("threaded batch (warm cache)", timeit(lambda: receiver.load_image(image_arg, 1, output_batch=True))),
+    ]
+
+    rows = [("legacy sequential", f"{t_legacy * 1000:.1f}", f"{t_legacy * 1000 / opts.count:.2f}", "1.00x")]
+    for mode, t in timings:
+        rows.append((mode, f"{t * 1000:.1f}", f"{t * 1000 / opts.count:.2f}", f"{t_legacy / t:.2f}x"))
+    print_table(("mode", "total ms", "ms / image", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
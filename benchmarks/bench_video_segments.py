@@ -0,0 +1,65 @@
+"""
+LG_CreateAndSaveVideo 分段并行编码基准
+生成带运动和噪声的合成帧，比较不同段数下的编码耗时与输出大小（需要 PATH 中有 ffmpeg）
+
+用法: python benchmarks/bench_video_segments.py [--frames 240] [--width 640] [--height 360] [--segments 1,2,4,8]
+"""
+
+import argparse
+import os
+
+import torch
+
+from common import load, print_table, timeit, work_dir
+
+
+def synthetic_frames(count, width, height, seed=0):
+    """水平移动的渐变叠加低幅噪声，避免编码器遇到过于简单的画面"""
+    generator = torch.Generator().manual_seed(seed)
+    x = torch.linspace(0, 1, width).view(1, 1, width, 1)
+    y = torch.linspace(0, 1, height).view(1, height, 1, 1)
+    t = torch.arange(count, dtype=torch.float32).view(count, 1, 1, 1) / max(count, 1)
+    frames = torch.cat([
+        (x + t).remainder(1.0).expand(count, height, width, 1),
+        (y + 2 * t).remainder(1.0).expand(count, height, width, 1),
+        ((x + y) / 2).expand(count, height, width, 1),
+    ], dim=-1)
+    noise = torch.rand(frames.shape, generator=generator) * 0.1
+    return (frames + noise).clamp_(0, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=240, help="帧数")
+    parser.add_argument("--width", type=int, default=640, help="帧宽度")
+    parser.add_argument("--height", type=int, default=360, help="帧高度")
+    parser.add_argument("--fps", type=float, default=24.0, help="帧率")
+    parser.add_argument("--segments", default="1,2,4,8", help="逗号分隔的段数")
+    parser.add_argument("--repeat", type=int, default=1, help="每种段数重复次数，取最快一次")
+    opts = parser.parse_args()
+
+    ffmpeg_utils = load("ffmpeg_utils")
+    images = synthetic_frames(opts.frames, opts.width, opts.height)
+    output_dir = os.path.join(work_dir(), "segments")
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"{opts.frames} 帧 {opts.width}x{opts.height}，CPU 核数 {os.cpu_count()}")
+
+    rows = []
+    baseline = None
+    for segments in [int(s) for s in opts.segments.split(",")]:
+        path = os.path.join(output_dir, f"segments_{segments}.mp4")
+        elapsed = timeit(lambda: ffmpeg_utils.encode_segments(images, path, opts.fps, segments), opts.repeat)
+        baseline = baseline or elapsed
+        rows.append((
+            segments,
+            f"{elapsed * 1000:.0f}",
+            f"{opts.frames / elapsed:.1f}",
+            f"{os.path.getsize(path) / 1024:.0f}",
+            f"{baseline / elapsed:.2f}x",
+        ))
+
+    print_table(("segments", "total ms", "frames / s", "output KB", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
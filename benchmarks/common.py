@@ -0,0 +1,184 @@
+"""
+基准测试公共工具
+在没有 ComfyUI 运行环境时，为 server / folder_paths 等模块安装最小替身，
+并把仓库的 py/ 目录加载为包 lg_py，使 py/ 下的模块可以脱离 ComfyUI 直接导入。
+"""
+
+import importlib
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import types
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PY_DIR = os.path.join(REPO_DIR, "py")
+PACKAGE = "lg_py"
+
+_work_dir = None
+
+
+def work_dir():
+    """基准测试使用的临时工作目录（进程内共享）"""
+    global _work_dir
+    if _work_dir is None:
+        _work_dir = tempfile.mkdtemp(prefix="lg_bench_")
+    return _work_dir
+
+
+def _module(name, **attrs):
+    mod = types.ModuleType(name)
+    mod.__dict__.update(attrs)
+    sys.modules[name] = mod
+    return mod
+
+
+def _try_import(name):
+    try:
+        importlib.import_module(name)
+        return True
+    except ImportError:
+        return False
+
+
+def install_stubs():
+    """为缺失的 ComfyUI 模块安装替身，已存在的真实模块不会被替换"""
+    if not _try_import("server"):
+        class _Routes:
+            def _register(self, *args, **kwargs):
+                return lambda fn: fn
+            get = post = put = delete = _register
+
+        class _Server:
+            def __init__(self):
+                self.routes = _Routes()
+                self.client_id = None
+                self.last_prompt_id = None
+                self.events = []
+
+            def send_sync(self, event, data, sid=None):
+                self.events.append((event, data))
+
+        class PromptServer:
+            instance = _Server()
+
+        class BinaryEventTypes:
+            PREVIEW_IMAGE = 1
+            UNENCODED_PREVIEW_IMAGE = 2
+
+        _module("server", PromptServer=PromptServer, BinaryEventTypes=BinaryEventTypes)
+
+    if not _try_import("folder_paths"):
+        def get_temp_directory():
+            path = os.path.join(work_dir(), "temp")
+            os.makedirs(path, exist_ok=True)
+            return path
+
+        def get_output_directory():
+            path = os.path.join(work_dir(), "output")
+            os.makedirs(path, exist_ok=True)
+            return path
+
+        def get_save_image_path(filename_prefix, output_dir, image_width=0, image_height=0):
+            subfolder = os.path.dirname(os.path.normpath(filename_prefix))
+            filename = os.path.basename(os.path.normpath(filename_prefix))
+            full_output_folder = os.path.join(output_dir, subfolder)
+            os.makedirs(full_output_folder, exist_ok=True)
+            counter = 1
+            prefix = filename + "_"
+            for name in os.listdir(full_output_folder):
+                if name.startswith(prefix):
+                    digits = name[len(prefix):len(prefix) + 5]
+                    if digits.isdigit():
+                        counter = max(counter, int(digits) + 1)
+            return full_output_folder, filename, counter, subfolder, filename_prefix
+
+        _module("folder_paths",
+                get_temp_directory=get_temp_directory,
+                get_output_directory=get_output_directory,
+                get_save_image_path=get_save_image_path)
+
+    if not _try_import("nodes"):
+        class SaveImage:
+            pass
+        _module("nodes", SaveImage=SaveImage)
+
+    if not _try_import("comfy.cli_args"):
+        comfy = sys.modules.get("comfy") or _module("comfy")
+        comfy.__path__ = []
+        cli_args = _module("comfy.cli_args", args=types.SimpleNamespace(disable_metadata=True))
+        comfy.cli_args = cli_args
+
+    if not _try_import("comfy.utils"):
+        class ProgressBar:
+            def __init__(self, total, node_id=None):
+                self.total = total
+                self.current = 0
+
+            def update_absolute(self, value, total=None, preview=None):
+                self.current = value
+
+            def update(self, value):
+                self.current += value
+
+        utils = _module("comfy.utils", ProgressBar=ProgressBar)
+        sys.modules["comfy"].utils = utils
+
+    if not _try_import("comfy.model_management"):
+        class InterruptProcessingException(Exception):
+            pass
+
+        mm = _module("comfy.model_management",
+                     InterruptProcessingException=InterruptProcessingException,
+                     processing_interrupted=lambda: False,
+                     throw_exception_if_processing_interrupted=lambda: None)
+        sys.modules["comfy"].model_management = mm
+
+
+def load(name):
+    """以 lg_py.<name> 的形式导入 py/ 下的模块"""
+    install_stubs()
+    if PACKAGE not in sys.modules:
+        pkg = types.ModuleType(PACKAGE)
+        pkg.__path__ = [PY_DIR]
+        sys.modules[PACKAGE] = pkg
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+def synthetic_audio(seconds, sample_rate=48000, channels=2, batch=1, seed=0):
+    """AUDIO 输入：不同频率的正弦叠加低幅噪声，waveform 形状 [batch, channels, samples]"""
+    import torch
+
+    generator = torch.Generator().manual_seed(seed)
+    t = torch.arange(int(seconds * sample_rate), dtype=torch.float32) / sample_rate
+    freqs = torch.arange(1, batch * channels + 1, dtype=torch.float32).view(batch, channels, 1) * 110
+    waveform = 0.5 * torch.sin(2 * math.pi * freqs * t)
+    noise = torch.rand(waveform.shape, generator=generator) * 0.05
+    return {"waveform": waveform + noise, "sample_rate": sample_rate}
+
+
+def timeit(fn, repeat=3):
+    """返回多次运行中最快一次的耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def print_table(headers, rows):
+    widths = [max([len(str(h))] + [len(str(r[i])) for r in rows]) for i, h in enumerate(headers)]
+    line = "  ".join(str(h).ljust(w) for h, w in zip(headers, widths))
+    print(line)
+    print("-" * len(line))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
+
+
+def write_report(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"报告已写入: {path}")
@@ -0,0 +1,434 @@
+"""
+有界累积存储
+用于 LG_AccumulatePreview 等需要长时间累积张量的节点：
+1. 内存预算：常驻内存超过预算时，把最早的张量写入磁盘并替换为内存映射(memmap)张量，
+   下游读取时由操作系统按页懒加载，不再占用常驻内存
+2. 数量上限：超过上限后按 ring_buffer（丢弃最早）或 stop（忽略新输入）处理
+3. 批量模式：尺寸一致时维护一个按倍数扩容的连续批量张量 [N, H, W, C]，
+   追加为均摊 O(1)，输出直接返回视图，不再每次重建列表并拼接
+"""
+
+import os
+import threading
+import uuid
+import weakref
+
+import numpy as np
+import torch
+
+OVERFLOW_MODES = ["ring_buffer", "stop"]
+
+
+def tensor_nbytes(tensor):
+    return tensor.numel() * tensor.element_size()
+
+
+def _memmap_tensor(path, dtype, shape, mode, offset=0):
+    return torch.from_numpy(np.memmap(path, dtype=dtype, mode=mode, shape=shape, offset=offset))
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        # Windows 下仍被映射的文件无法删除，留给临时目录清理
+        pass
+
+
+class _Item:
+    __slots__ = ("tensor", "info", "path", "rows")
+
+    def __init__(self, tensor, info=None, rows=1):
+        self.tensor = tensor  # 批量模式下为 None，数据位于批量缓冲区
+        self.info = info
+        self.path = None  # 溢出到磁盘后的文件路径
+        self.rows = rows
+
+    @property
+    def spilled(self):
+        return self.path is not None
+
+
+class _BatchBuffer:
+    """
+    按倍数扩容的连续批量缓冲区
+    扩容和压缩都分配新的存储，之前返回给下游的视图不会被改写
+    溢出后缓冲区本身以 w+ 映射写入，交给下游的数据通过 snapshot() 取写时复制映射，下游原地修改不会写回文件
+    """
+
+    def __init__(self, frame_shape, dtype, spill_dir):
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = dtype
+        self.spill_dir = spill_dir
+        self.frame_bytes = int(np.prod(self.frame_shape)) * torch.empty((), dtype=dtype).element_size()
+        self._data = None
+        self._path = None
+        self._np_dtype = None
+        self._start = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def capacity(self):
+        return 0 if self._data is None else self._data.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.capacity * self.frame_bytes
+
+    @property
+    def spilled(self):
+        return self._path is not None
+
+    def matches(self, tensor):
+        return tuple(tensor.shape[1:]) == self.frame_shape and tensor.dtype == self.dtype
+
+    def append(self, tensor, memory_budget=0):
+        rows = tensor.shape[0]
+        if self._start + self._len + rows > self.capacity:
+            # 容量不足：丢弃头部空洞并按倍数扩容
+            self._reallocate(max(self._len + rows, self.capacity * 2, 8), memory_budget)
+        end = self._start + self._len
+        self._data[end:end + rows] = tensor
+        self._len += rows
+
+    def drop_front(self, rows, memory_budget=0):
+        rows = min(rows, self._len)
+        self._start += rows
+        self._len -= rows
+        # 头部空洞超过一半容量时压缩，保持均摊 O(1)
+        if self._start > self.capacity // 2:
+            self._reallocate(max(self._len * 2, 8), memory_budget)
+
+    def ensure_budget(self, memory_budget):
+        """常驻缓冲区超出预算时迁移到磁盘映射"""
+        if memory_budget and not self.spilled and self.nbytes > memory_budget:
+            self._reallocate(self.capacity, memory_budget)
+
+    def view(self, start=0, stop=None):
+        stop = self._len if stop is None else stop
+        return self._data[self._start + start:self._start + stop]
+
+    def snapshot(self, start=0, stop=None):
+        """交给下游的 [start, stop) 行：常驻时为视图，溢出时为同一文件的写时复制映射"""
+        stop = self._len if stop is None else stop
+        if not self.spilled or stop <= start:
+            return self.view(start, stop)
+        return _memmap_tensor(self._path, self._np_dtype, (stop - start,) + self.frame_shape, "c",
+                              offset=(self._start + start) * self.frame_bytes)
+
+    def release(self):
+        self._data = None
+        if self._path:
+            _remove_file(self._path)
+            self._path = None
+        self._np_dtype = None
+        self._start = 0
+        self._len = 0
+
+    def _reallocate(self, capacity, memory_budget):
+        shape = (capacity,) + self.frame_shape
+        path = None
+        np_dtype = None
+        if memory_budget and capacity * self.frame_bytes > memory_budget:
+            try:
+                np_dtype = torch.empty((), dtype=self.dtype).numpy().dtype
+            except (TypeError, RuntimeError):
+                # numpy 不支持的 dtype（如 bfloat16），保持常驻
+                pass
+        if np_dtype is not None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}.batch.bin")
+            data = _memmap_tensor(path, np_dtype, shape, "w+")
+        else:
+            data = torch.empty(shape, dtype=self.dtype)
+
+        if self._len:
+            data[:self._len] = self.view()
+
+        old_path = self._path
+        self._data = data
+        self._path = path
+        self._np_dtype = np_dtype if path else None
+        self._start = 0
+        if old_path:
+            _remove_file(old_path)
+
+
+class AccumulationStore:
+    """
+    按顺序累积张量的有界存储
+
+    Args:
+        spill_dir: 溢出文件目录
+        memory_budget: 常驻内存预算（字节），0 表示不限制、从不溢出
+        max_count: 最多保留的条目数，0 表示不限制
+        overflow_mode: 达到 max_count 后的处理方式，ring_buffer 丢弃最早条目，stop 忽略新条目
+    """
+
+    def __init__(self, spill_dir, memory_budget=0, max_count=0, overflow_mode="ring_buffer"):
+        self.spill_dir = spill_dir
+        self.memory_budget = memory_budget
+        self.max_count = max_count
+        self.overflow_mode = overflow_mode
+        self.batch_mode = False
+        self._batch = None
+        self._items = []
+        self._lock = threading.RLock()
+        self._resident_bytes = 0
+        self._spilled_bytes = 0
+
+    def configure(self, memory_budget=None, max_count=None, overflow_mode=None, batch_mode=None):
+        """更新限制参数，收紧后立即生效"""
+        with self._lock:
+            if memory_budget is not None:
+                self.memory_budget = memory_budget
+            if max_count is not None:
+                self.max_count = max_count
+            if overflow_mode is not None:
+                self.overflow_mode = overflow_mode
+            if batch_mode is not None and batch_mode != self.batch_mode:
+                self.batch_mode = batch_mode
+                if batch_mode:
+                    self._to_batch()
+                else:
+                    self._to_list()
+            self._enforce_count()
+            self._enforce_budget()
+
+    def __len__(self):
+        return len(self._items)
+
+    def append(self, tensor, info=None):
+        """追加一个张量，返回是否被接受（stop 模式下达到上限时返回 False）"""
+        with self._lock:
+            if self.max_count and len(self._items) >= self.max_count and self.overflow_mode == "stop":
+                return False
+
+            tensor = tensor.detach()
+            if tensor.device.type != "cpu":
+                tensor = tensor.cpu()
+
+            if self.batch_mode and self._batch is None and not self._items:
+                self._batch = _BatchBuffer(tensor.shape[1:], tensor.dtype, self.spill_dir)
+            if self._batch is not None and not self._batch.matches(tensor):
+                print(f"[AccumulationStore] 尺寸不一致 {tuple(tensor.shape)}，批量模式回退为列表模式")
+                self._to_list()
+
+            if self._batch is not None:
+                self._batch.append(tensor, self.memory_budget)
+                self._items.append(_Item(None, info, rows=tensor.shape[0]))
+            else:
+                self._items.append(_Item(tensor, info, rows=tensor.shape[0]))
+                self._resident_bytes += tensor_nbytes(tensor)
+
+            self._enforce_count()
+            self._enforce_budget()
+            return True
+
+    def tensors(self, last=None):
+        """
+        按累积顺序返回张量列表（last 指定时只返回最后 last 个）
+        已溢出的为 memmap 张量，批量模式下为批量缓冲区的视图，读取时才真正从磁盘分页加载
+        """
+        with self._lock:
+            items = self._items if last is None else self._items[len(self._items) - min(last, len(self._items)):]
+            if self._batch is None:
+                return [item.tensor for item in items]
+
+            offset = len(self._batch) - sum(item.rows for item in items)
+            data = self._batch.snapshot(offset)
+            result = []
+            start = 0
+            for item in items:
+                result.append(data[start:start + item.rows])
+                start += item.rows
+            return result
+
+    def batch(self):
+        """批量模式下返回全部数据的连续视图 [N, ...]，否则返回 None"""
+        with self._lock:
+            if self._batch is None or not self._items:
+                return None
+            return self._batch.snapshot()
+
+    def infos(self, last=None):
+        with self._lock:
+            items = self._items if last is None else self._items[len(self._items) - min(last, len(self._items)):]
+            return [item.info for item in items]
+
+    def clear(self):
+        with self._lock:
+            for item in self._items:
+                self._drop(item)
+            self._items = []
+            if self._batch is not None:
+                self._batch.release()
+                self._batch = None
+            self._resident_bytes = 0
+            self._spilled_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            resident_bytes = self._resident_bytes
+            spilled_bytes = self._spilled_bytes
+            if self._batch is not None:
+                if self._batch.spilled:
+                    spilled_bytes += self._batch.nbytes
+                else:
+                    resident_bytes += self._batch.nbytes
+            return {
+                "count": len(self._items),
+                "resident_bytes": resident_bytes,
+                "spilled_bytes": spilled_bytes,
+                "spilled_count": sum(1 for item in self._items if item.spilled),
+                "memory_budget": self.memory_budget,
+                "max_count": self.max_count,
+                "overflow_mode": self.overflow_mode,
+                "batch_mode": self._batch is not None,
+            }
+
+    def _to_batch(self):
+        """把现有条目迁移到批量缓冲区，尺寸不一致时保持列表模式"""
+        if self._batch is not None:
+            return
+        if not self._items:
+            return
+        first = self._items[0].tensor
+        frame_shape, dtype = tuple(first.shape[1:]), first.dtype
+        if any(tuple(item.tensor.shape[1:]) != frame_shape or item.tensor.dtype != dtype for item in self._items):
+            print("[AccumulationStore] 已累积的张量尺寸不一致，保持列表模式")
+            return
+
+        batch = _BatchBuffer(frame_shape, dtype, self.spill_dir)
+        for item in self._items:
+            batch.append(item.tensor, self.memory_budget)
+            self._drop(item)
+        self._batch = batch
+        self._resident_bytes = 0
+        self._spilled_bytes = 0
+
+    def _to_list(self):
+        """把批量缓冲区拆回独立张量（拷贝，释放整块缓冲区）"""
+        if self._batch is None:
+            return
+        for item, tensor in zip(self._items, self.tensors()):
+            item.tensor = tensor.clone()
+            self._resident_bytes += tensor_nbytes(item.tensor)
+        self._batch.release()
+        self._batch = None
+
+    def _enforce_count(self):
+        if not self.max_count:
+            return
+        while len(self._items) > self.max_count:
+            item = self._items.pop(0)
+            if self._batch is not None:
+                self._batch.drop_front(item.rows, self.memory_budget)
+            else:
+                self._account_removed(item)
+                self._drop(item)
+
+    def _enforce_budget(self):
+        if self._batch is not None:
+            self._batch.ensure_budget(self.memory_budget)
+            return
+        if not self.memory_budget or self._resident_bytes <= self.memory_budget:
+            return
+        # 从最早的条目开始溢出，最新的条目保持常驻
+        for item in self._items:
+            if self._resident_bytes <= self.memory_budget:
+                break
+            if not item.spilled:
+                self._spill(item)
+
+    def _spill(self, item):
+        tensor = item.tensor
+        try:
+            array = tensor.contiguous().numpy()
+        except (TypeError, RuntimeError):
+            # numpy 不支持的 dtype（如 bfloat16），保持常驻
+            return
+
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}.bin")
+        mm = np.memmap(path, dtype=array.dtype, mode="w+", shape=array.shape)
+        mm[...] = array
+        mm.flush()
+        del mm
+
+        # 写时复制映射：下游即使原地修改也不会写回文件
+        nbytes = tensor_nbytes(tensor)
+        item.tensor = _memmap_tensor(path, array.dtype, array.shape, "c")
+        item.path = path
+        self._resident_bytes -= nbytes
+        self._spilled_bytes += nbytes
+
+    def _account_removed(self, item):
+        nbytes = tensor_nbytes(item.tensor)
+        if item.spilled:
+            self._spilled_bytes -= nbytes
+        else:
+            self._resident_bytes -= nbytes
+
+    def _drop(self, item):
+        path = item.path
+        item.tensor = None
+        item.path = None
+        if path:
+            _remove_file(path)
+
+    def __del__(self):
+        try:
+            self.clear()
+        except Exception:
+            pass
+
+
+# ============ 累积节点注册表 ============
+# 按节点 unique_id 记录持有累积数据的节点实例（弱引用），供 /lg/accumulators 接口查询和清理。
+# 注册对象需要实现 accumulator_stats() 和 clear_accumulated() 两个方法。
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def register_accumulator(unique_id, owner):
+    if unique_id is None:
+        return
+    with _registry_lock:
+        _registry[str(unique_id)] = weakref.ref(owner)
+
+
+def _live_accumulators():
+    with _registry_lock:
+        for node_id, ref in list(_registry.items()):
+            if ref() is None:
+                del _registry[node_id]
+        return [(node_id, ref()) for node_id, ref in _registry.items() if ref() is not None]
+
+
+def accumulator_stats(node_id=None):
+    """返回已注册累积节点的统计信息列表，node_id 指定时只返回该节点"""
+    result = []
+    for nid, owner in _live_accumulators():
+        if node_id is not None and nid != str(node_id):
+            continue
+        stats = owner.accumulator_stats()
+        stats["node_id"] = nid
+        stats["class_type"] = type(owner).__name__
+        result.append(stats)
+    return result
+
+
+def clear_accumulators(node_id=None):
+    """清空累积数据，node_id 为 None 时清空全部，返回被清空的节点 ID 列表"""
+    cleared = []
+    for nid, owner in _live_accumulators():
+        if node_id is not None and nid != str(node_id):
+            continue
+        owner.clear_accumulated()
+        cleared.append(nid)
+    return cleared
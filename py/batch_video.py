@@ -1,18 +1,33 @@
 """
 视频合并节点
-1. CreateAndSaveVideo: 从图片创建视频并保存，返回路径
-2. ConcatVideoFiles: 使用 FFmpeg 合并多个视频文件（多行文本输入路径）
+1. CreateAndSaveVideo: 从图片创建视频并保存，返回路径；stream 模式下跨多次执行追加帧
+2. ConcatVideoFiles: 使用 FFmpeg 合并多个视频文件（多行文本输入路径）；append 模式下只处理新增的片段
 3. SaveAudioGetPath: 保存音频并返回文件路径
+4. FinalizeVideoStream: 结束 stream 模式的编码会话，返回视频路径
 """
 
 from __future__ import annotations
 
+import itertools
+import json
 import os
-import subprocess
+import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import folder_paths
 from fractions import Fraction
 from comfy.cli_args import args
+from .save_counter import get_save_path
+from .ffmpeg_utils import (FrameStreamEncoder, open_stream_session, close_stream_session, encode_segments,
+                           encoder_input_types, resolve_encoder, write_concat_list, concat_command,
+                           conform_segments, run_ffmpeg, total_duration, append_to_ts, reencode_file)
+from .trans import any_typ
+
+try:
+    import av
+except ImportError:
+    av = None
+
 CATEGORY_TYPE = "🎈LAOGOU/Group"
 
 class LG_CreateAndSaveVideo:
@@ -30,6 +45,12 @@ class LG_CreateAndSaveVideo:
             },
             "optional": {
                 "audio": ("AUDIO",),
+                "mode": (["single", "stream", "stream_finalize"], {"default": "single",
+                    "tooltip": "single=每次保存完整视频；stream=按 filename_prefix 追加到编码会话，"
+                               "stream_finalize=追加后结束会话并写出文件"}),
+                "segments": ("INT", {"default": 1, "min": 1, "max": 64, "step": 1,
+                    "tooltip": "single 模式下分段并行编码的段数，1 表示不分段；多核 CPU 上可显著缩短编码时间"}),
+                **encoder_input_types(),
             },
             "hidden": {
                 "prompt": "PROMPT",
@@ -43,7 +64,23 @@ class LG_CreateAndSaveVideo:
     CATEGORY = CATEGORY_TYPE
     DESCRIPTION = "从图片创建视频并保存，返回文件路径"
 
-    def create_and_save(self, images, fps, filename_prefix, audio=None, prompt=None, extra_pnginfo=None):
+    @classmethod
+    def IS_CHANGED(cls, mode="single", **kwargs):
+        if mode != "single":
+            return float("NaN")  # 流式模式每次执行都要追加帧
+        return ""
+
+    def create_and_save(self, images, fps, filename_prefix, audio=None, mode="single", segments=1,
+                        encoder_profile="default", preset="medium", crf=23, tune="none", threads=0,
+                        prompt=None, extra_pnginfo=None):
+        encoder = resolve_encoder(encoder_profile, preset, crf, tune, threads)
+        if mode != "single":
+            return self.stream(images, fps, filename_prefix, audio, mode == "stream_finalize", encoder,
+                               prompt, extra_pnginfo)
+        if segments > 1 or encoder_profile != "default" or threads:
+            # 自定义编码参数时通过 ffmpeg 管道编码，segments 为 1 时即单进程
+            return self.save_segmented(images, fps, filename_prefix, audio, segments, encoder, prompt, extra_pnginfo)
+
         try:
             from comfy_api.latest._input_impl.video_types import VideoFromComponents
             from comfy_api.latest._util.video_types import VideoComponents, VideoContainer, VideoCodec
@@ -59,20 +96,10 @@ class LG_CreateAndSaveVideo:
         width, height = images.shape[2], images.shape[1]
         output_dir = folder_paths.get_output_directory()
         
-        full_output_folder, filename, counter, subfolder, _ = folder_paths.get_save_image_path(
-            filename_prefix, output_dir, width, height
+        full_output_folder, filename, counter, subfolder, _ = get_save_path(
+            filename_prefix, output_dir, width, height, suffix="_.mp4"
         )
         
-        saved_metadata = None
-        if not args.disable_metadata:
-            metadata = {}
-            if extra_pnginfo is not None:
-                metadata.update(extra_pnginfo)
-            if prompt is not None:
-                metadata["prompt"] = prompt
-            if len(metadata) > 0:
-                saved_metadata = metadata
-        
         file = f"{filename}_{counter:05}_.mp4"
         file_path = os.path.join(full_output_folder, file)
         
@@ -80,18 +107,65 @@ class LG_CreateAndSaveVideo:
             file_path,
             format=VideoContainer.MP4,
             codec=VideoCodec.H264,
-            metadata=saved_metadata
+            metadata=self._metadata(prompt, extra_pnginfo)
         )
         
         return (file_path,)
 
+    @staticmethod
+    def _metadata(prompt, extra_pnginfo):
+        if args.disable_metadata:
+            return None
+        metadata = {}
+        if extra_pnginfo is not None:
+            metadata.update(extra_pnginfo)
+        if prompt is not None:
+            metadata["prompt"] = prompt
+        return metadata or None
+
+    def save_segmented(self, images, fps, filename_prefix, audio, segments, encoder, prompt, extra_pnginfo):
+        """分段并行编码后以流复制拼接"""
+        width, height = images.shape[2], images.shape[1]
+        full_output_folder, filename, counter, _, _ = get_save_path(
+            filename_prefix, folder_paths.get_output_directory(), width, height, suffix="_.mp4"
+        )
+        file_path = os.path.join(full_output_folder, f"{filename}_{counter:05}_.mp4")
+        encode_segments(images, file_path, fps, segments, self._metadata(prompt, extra_pnginfo), audio, encoder)
+        return (file_path,)
+
+    def stream(self, images, fps, filename_prefix, audio, finalize, encoder, prompt, extra_pnginfo):
+        """流式模式：帧通过管道写入常驻编码进程，内存中只保留当前批次"""
+        width, height = images.shape[2], images.shape[1]
+
+        def create_session():
+            full_output_folder, filename, counter, _, _ = get_save_path(
+                filename_prefix, folder_paths.get_output_directory(), width, height, suffix="_.mp4"
+            )
+            file_path = os.path.join(full_output_folder, f"{filename}_{counter:05}_.mp4")
+            print(f"[CreateAndSaveVideo] 创建编码会话 {filename_prefix} -> {file_path}")
+            return FrameStreamEncoder(file_path, width, height, fps, self._metadata(prompt, extra_pnginfo), encoder)
+
+        session = open_stream_session(filename_prefix, create_session)
+        if fps != session.fps:
+            print(f"[CreateAndSaveVideo] 警告：帧率 {fps} 与编码会话 {session.fps} 不一致，沿用会话帧率")
+        session.write(images, audio)
+
+        if finalize:
+            close_stream_session(filename_prefix)
+            print(f"[CreateAndSaveVideo] 编码会话 {filename_prefix} 完成，共 {session.frames} 帧")
+        return (session.output_path,)
+
 
 class LG_ConcatVideoFiles:
     """
     使用 FFmpeg 合并多个视频文件
     支持字符串列表输入或多行文本输入
     可选添加音频轨道
+    append 模式：循环中每次传入不断增长的片段列表时，只把新增片段追加到按 filename_prefix 保存的 MPEG-TS 中间文件，
+    append_finalize 时再封装为 MP4
     """
+
+    _append_states = {}  # filename_prefix -> {"ts_path", "segments", "offset", "reference", "owned_reference"}
     
     @classmethod
     def INPUT_TYPES(cls):
@@ -103,12 +177,18 @@ class LG_ConcatVideoFiles:
             "optional": {
                 "reencode": ("BOOLEAN", {"default": False, 
                     "tooltip": "False=直接拼接(快)，True=重新编码(兼容性好)"}),
+                "auto_compat": ("BOOLEAN", {"default": True,
+                    "tooltip": "直接拼接前用 ffprobe 检查片段编码参数，只重新编码不一致的片段"}),
+                "concat_mode": (["full", "append", "append_finalize"], {"default": "full",
+                    "tooltip": "full=每次完整拼接；append=只追加新增片段到中间文件并返回其路径；"
+                               "append_finalize=追加后封装为 MP4 并结束"}),
                 "audio_path": ("STRING", {"forceInput": True,
                     "tooltip": "可选的音频文件路径，将替换或添加到合并后的视频"}),
                 "audio_mode": (["replace", "mix"], {"default": "replace",
                     "tooltip": "replace=替换原音频，mix=混合原音频和新音频"}),
                 "audio_volume": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 2.0, "step": 0.1,
                     "tooltip": "音频音量，1.0为原始音量"}),
+                **encoder_input_types(),
             }
         }
     
@@ -120,13 +200,24 @@ class LG_ConcatVideoFiles:
     INPUT_IS_LIST = True
     DESCRIPTION = "使用 FFmpeg 合并多个视频文件，支持列表输入，可选添加音频"
 
-    def concat_files(self, video_paths, filename_prefix, reencode=None, audio_path=None, audio_mode=None, audio_volume=None):
+    def concat_files(self, video_paths, filename_prefix, reencode=None, audio_path=None, audio_mode=None, audio_volume=None,
+                     encoder_profile=None, preset=None, crf=None, tune=None, threads=None, auto_compat=None,
+                     concat_mode=None):
         # 处理其他参数（因为 INPUT_IS_LIST=True，所有参数都是列表）
         filename_prefix = filename_prefix[0] if isinstance(filename_prefix, list) else filename_prefix
         reencode = reencode[0] if isinstance(reencode, list) and reencode else False
+        auto_compat = auto_compat[0] if isinstance(auto_compat, list) and auto_compat else True
+        concat_mode = concat_mode[0] if isinstance(concat_mode, list) and concat_mode else "full"
         audio_path = audio_path[0] if isinstance(audio_path, list) and audio_path else None
         audio_mode = audio_mode[0] if isinstance(audio_mode, list) and audio_mode else "replace"
         audio_volume = audio_volume[0] if isinstance(audio_volume, list) and audio_volume else 1.0
+        encoder = resolve_encoder(
+            encoder_profile[0] if encoder_profile else "default",
+            preset[0] if preset else "medium",
+            crf[0] if crf else 23,
+            tune[0] if tune else "none",
+            threads[0] if threads else 0,
+        )
         
         # 展平并处理路径列表
         paths = []
@@ -156,143 +247,189 @@ class LG_ConcatVideoFiles:
             print(f"[ConcatVideoFiles] 警告：音频文件不存在，跳过音频合并: {audio_path}")
             audio_path = None
         
+        if concat_mode != "full":
+            ts_path = self.append_segments(paths, filename_prefix, reencode, auto_compat, encoder)
+            if concat_mode == "append":
+                return {"ui": {"images": []}, "result": (ts_path,)}
+            # 结束：中间文件作为唯一输入走下面的流复制封装（同时加入音频）；
+            # 封装成功后才删除中间文件和状态，失败时可以再次 append_finalize 重试
+            paths, reencode, auto_compat = [ts_path], False, False
+        
         output_dir = folder_paths.get_output_directory()
-        full_output_folder, filename, counter, subfolder, _ = folder_paths.get_save_image_path(
-            filename_prefix, output_dir, 0, 0
+        full_output_folder, filename, counter, subfolder, _ = get_save_path(
+            filename_prefix, output_dir, 0, 0, suffix="_.mp4"
         )
         output_file = os.path.join(full_output_folder, f"{filename}_{counter:05}_.mp4")
         
-        # 创建 FFmpeg concat 列表
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-            for p in paths:
-                escaped_path = p.replace("'", "'\\''")
-                f.write(f"file '{escaped_path}'\n")
-            concat_file = f.name
-        
+        # 创建 FFmpeg concat 列表，拼接与音频处理在一次 ffmpeg 调用中完成
+        work_dir = tempfile.mkdtemp(prefix="lg_concat_")
+        concat_file = None
         try:
-            if audio_path:
-                # 有音频输入时，需要两步处理：先合并视频，再添加音频
-                # 创建临时文件用于中间结果
-                temp_video = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
-                
-                # 第一步：合并视频片段
-                if reencode:
-                    cmd1 = [
-                        'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file,
-                        '-c:v', 'libx264', '-preset', 'medium', '-crf', '23',
-                        '-an',  # 不包含音频
-                        '-movflags', '+faststart',
-                        temp_video
-                    ]
+            if not reencode and auto_compat:
+                conformed = conform_segments(paths, work_dir, encoder)
+                if conformed is None:
+                    print("[ConcatVideoFiles] 片段参数不一致且无法单独转换，整体重新编码")
+                    reencode = True
                 else:
-                    cmd1 = [
-                        'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file,
-                        '-c:v', 'copy', '-an',
-                        '-movflags', '+faststart',
-                        temp_video
-                    ]
-                
-                result = subprocess.run(cmd1, capture_output=True, text=True)
-                if result.returncode != 0:
-                    raise RuntimeError(f"FFmpeg 合并视频错误:\n{result.stderr}")
-                
-                # 第二步：添加音频
-                if audio_mode == "mix":
-                    # 混合模式：先合并带原音频的视频，再混合新音频
-                    # 重新合并带音频的视频
-                    temp_video_with_audio = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
-                    if reencode:
-                        cmd_audio = [
-                            'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file,
-                            '-c:v', 'libx264', '-preset', 'medium', '-crf', '23',
-                            '-c:a', 'aac', '-b:a', '128k',
-                            '-movflags', '+faststart',
-                            temp_video_with_audio
-                        ]
-                    else:
-                        cmd_audio = [
-                            'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file,
-                            '-c', 'copy',
-                            '-movflags', '+faststart',
-                            temp_video_with_audio
-                        ]
-                    result = subprocess.run(cmd_audio, capture_output=True, text=True)
-                    if result.returncode != 0:
-                        raise RuntimeError(f"FFmpeg 合并音频错误:\n{result.stderr}")
-                    
-                    # 混合两个音频
-                    cmd2 = [
-                        'ffmpeg', '-y',
-                        '-i', temp_video_with_audio,
-                        '-i', audio_path,
-                        '-filter_complex', f'[0:a][1:a]amix=inputs=2:duration=first:dropout_transition=2,volume={audio_volume}[a]',
-                        '-map', '0:v', '-map', '[a]',
-                        '-c:v', 'copy',
-                        '-c:a', 'aac', '-b:a', '128k',
-                        '-movflags', '+faststart',
-                        '-shortest',
-                        output_file
-                    ]
-                    try:
-                        result = subprocess.run(cmd2, capture_output=True, text=True)
-                        if result.returncode != 0:
-                            raise RuntimeError(f"FFmpeg 混合音频错误:\n{result.stderr}")
-                    finally:
-                        if os.path.exists(temp_video_with_audio):
-                            os.unlink(temp_video_with_audio)
-                else:
-                    # 替换模式：直接用新音频替换
-                    volume_filter = f'volume={audio_volume}' if audio_volume != 1.0 else None
-                    cmd2 = [
-                        'ffmpeg', '-y',
-                        '-i', temp_video,
-                        '-i', audio_path,
-                        '-map', '0:v', '-map', '1:a',
-                        '-c:v', 'copy',
-                    ]
-                    if volume_filter:
-                        cmd2.extend(['-af', volume_filter])
-                    cmd2.extend([
-                        '-c:a', 'aac', '-b:a', '128k',
-                        '-movflags', '+faststart',
-                        '-shortest',
-                        output_file
-                    ])
-                    result = subprocess.run(cmd2, capture_output=True, text=True)
-                    if result.returncode != 0:
-                        raise RuntimeError(f"FFmpeg 添加音频错误:\n{result.stderr}")
-                
-                # 清理临时文件
-                if os.path.exists(temp_video):
-                    os.unlink(temp_video)
-            else:
-                # 无音频输入，原有逻辑
-                if reencode:
-                    cmd = [
-                        'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file,
-                        '-c:v', 'libx264', '-preset', 'medium', '-crf', '23',
-                        '-c:a', 'aac', '-b:a', '128k',
-                        '-movflags', '+faststart',
-                        output_file
-                    ]
-                else:
-                    cmd = [
-                        'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file,
-                        '-c', 'copy',
-                        '-movflags', '+faststart',
-                        output_file
-                    ]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode != 0:
-                    raise RuntimeError(f"FFmpeg 错误:\n{result.stderr}")
+                    paths, converted = conformed
+                    if converted:
+                        print(f"[ConcatVideoFiles] {converted} 个片段参数不一致，已单独重新编码")
+            concat_file = write_concat_list(paths)
+            cmd = concat_command(concat_file, output_file, reencode, audio_path, audio_mode, audio_volume, encoder)
+            run_ffmpeg(cmd, total_duration(paths), "FFmpeg", output_file)
         finally:
-            if os.path.exists(concat_file):
+            if concat_file and os.path.exists(concat_file):
                 os.unlink(concat_file)
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if concat_mode == "append_finalize":
+            self._discard_append_state(filename_prefix)
         
         return {"ui": {"images": [{"filename": os.path.basename(output_file), "subfolder": subfolder, "type": "output"}], "animated": (True,)}, 
                 "result": (output_file,)}
 
+    def append_segments(self, paths, filename_prefix, reencode, auto_compat, encoder):
+        """把上次之后新增的片段追加到 MPEG-TS 中间文件，返回中间文件路径"""
+        # 以 (路径, 修改时间, 大小) 识别片段，列表前缀与上次一致时只处理新增部分
+        identities = [(os.path.abspath(p), os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths]
+        state = self._append_states.get(filename_prefix)
+        if state is not None and identities[:len(state["segments"])] != state["segments"]:
+            print(f"[ConcatVideoFiles] {filename_prefix} 的片段列表与之前不一致，重新开始拼接")
+            self._discard_append_state(filename_prefix)
+            state = None
+        if state is None:
+            fd, ts_path = tempfile.mkstemp(prefix="lg_concat_", suffix=".ts", dir=folder_paths.get_temp_directory())
+            os.close(fd)
+            state = {"ts_path": ts_path, "segments": [], "offset": 0.0, "reference": None, "owned_reference": False}
+            self._append_states[filename_prefix] = state
+
+        start = len(state["segments"])
+        new_paths = paths[start:]
+        if not new_paths:
+            return state["ts_path"]
+
+        work_dir = tempfile.mkdtemp(prefix="lg_concat_")
+        try:
+            if state["reference"] is None:
+                # 第一个片段决定中间文件的参数集；重新编码模式下先编码出参考文件，之后的片段都以它为准
+                if reencode:
+                    fd, reference = tempfile.mkstemp(prefix="lg_concat_ref_", suffix=".mp4",
+                                                     dir=folder_paths.get_temp_directory())
+                    os.close(fd)
+                    reencode_file(new_paths[0], reference, encoder)
+                    state["owned_reference"] = True
+                else:
+                    reference = new_paths[0]
+                state["reference"] = reference
+                new_paths = [reference] + new_paths[1:]
+            if reencode or auto_compat:
+                # 最终以流复制封装为 MP4，只保留第一个片段的 avcC，新增片段必须与参考片段的参数集一致
+                conformed = conform_segments(new_paths, work_dir, encoder, reference_path=state["reference"])
+                if conformed is None:
+                    raise RuntimeError("[ConcatVideoFiles] 新增片段无法转换为与第一个片段一致的编码参数，"
+                                       "已追加的片段保留，可直接 append_finalize，或改用 full 模式整体拼接")
+                new_paths = conformed[0]
+            for path, identity in zip(new_paths, identities[start:]):
+                duration = append_to_ts(path, state["ts_path"], state["offset"])
+                state["offset"] += duration or 0.0
+                state["segments"].append(identity)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        print(f"[ConcatVideoFiles] 追加 {len(new_paths)} 个片段，累计 {len(state['segments'])} 个")
+        return state["ts_path"]
+
+    @classmethod
+    def _discard_append_state(cls, filename_prefix):
+        """删除增量拼接的状态、中间文件和自行编码的参考文件"""
+        state = cls._append_states.pop(filename_prefix, None)
+        if state is None:
+            return
+        owned = [state["reference"]] if state["owned_reference"] and state["reference"] else []
+        for path in [state["ts_path"]] + owned:
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+# Opus 支持的采样率
+OPUS_RATES = [8000, 12000, 16000, 24000, 48000]
+AUDIO_BIT_RATES = {"64k": 64000, "96k": 96000, "128k": 128000, "192k": 192000, "320k": 320000}
+# 每次送入编码器的采样数，只有这一段会被转换为 float32 交错数据，峰值内存与音频长度无关
+AUDIO_CHUNK_SAMPLES = int(os.environ.get("LG_AUDIO_CHUNK_SAMPLES", 65536))
+
+
+def _audio_chunks(waveform, sample_rate, layout, chunk_samples=None):
+    """按固定长度切分 [channels, samples] 波形，逐段生成 AudioFrame，pts 以采样为单位递增"""
+    chunk_samples = max(1, chunk_samples or AUDIO_CHUNK_SAMPLES)
+    total = waveform.shape[-1]
+    for start in range(0, total, chunk_samples):
+        chunk = waveform[:, start:start + chunk_samples]
+        frame = av.AudioFrame.from_ndarray(
+            chunk.movedim(0, 1).reshape(1, -1).float().numpy(),
+            format="flt",
+            layout=layout,
+        )
+        frame.sample_rate = sample_rate
+        frame.pts = start
+        yield frame
+
+
+def _resample_chunks(frames, sample_rate, layout):
+    """流式重采样：重采样器在分段之间保留状态，结束时冲刷剩余采样"""
+    resampler = av.AudioResampler(format="flt", layout=layout, rate=sample_rate)
+    pts = 0
+    for frame in itertools.chain(frames, [None]):
+        for out in resampler.resample(frame):
+            out.pts = pts
+            pts += out.samples
+            yield out
+
+
+def _encode_audio_file(waveform, sample_rate, output_path, format, quality, metadata):
+    """把单个 [channels, samples] 波形编码并直接写入 output_path"""
+    source_rate = sample_rate
+    
+    # 处理 Opus 采样率要求，重采样在编码时分段进行
+    if format == "opus":
+        if sample_rate > 48000:
+            sample_rate = 48000
+        elif sample_rate not in OPUS_RATES:
+            for rate in sorted(OPUS_RATES):
+                if rate > sample_rate:
+                    sample_rate = rate
+                    break
+            if sample_rate not in OPUS_RATES:
+                sample_rate = 48000
+    
+    output_container = av.open(output_path, mode="w", format=format)
+    try:
+        # 设置元数据
+        for key, value in metadata.items():
+            output_container.metadata[key] = value
+        
+        layout = "mono" if waveform.shape[0] == 1 else "stereo"
+        
+        # 设置输出流
+        if format == "opus":
+            out_stream = output_container.add_stream("libopus", rate=sample_rate, layout=layout)
+            out_stream.bit_rate = AUDIO_BIT_RATES.get(quality, 128000)
+        elif format == "mp3":
+            out_stream = output_container.add_stream("libmp3lame", rate=sample_rate, layout=layout)
+            if quality == "V0":
+                out_stream.codec_context.qscale = 1
+            else:
+                out_stream.bit_rate = AUDIO_BIT_RATES.get(quality, 128000)
+        else:  # flac
+            out_stream = output_container.add_stream("flac", rate=sample_rate, layout=layout)
+        
+        # 分段送入编码器，避免一次性复制整段交错数据
+        frames = _audio_chunks(waveform, source_rate, layout)
+        if sample_rate != source_rate:
+            frames = _resample_chunks(frames, sample_rate, layout)
+        for frame in frames:
+            output_container.mux(out_stream.encode(frame))
+        output_container.mux(out_stream.encode(None))  # Flush
+    finally:
+        output_container.close()
+
 
 class LG_SaveAudioGetPath:
     """
@@ -319,46 +456,42 @@ class LG_SaveAudioGetPath:
             }
         }
     
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("file_path",)
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("file_path", "file_paths")
+    OUTPUT_IS_LIST = (False, True)
     OUTPUT_NODE = True
     FUNCTION = "save_audio"
     CATEGORY = CATEGORY_TYPE
     DESCRIPTION = "保存音频文件并返回文件路径，音频无效时返回空字符串"
 
     def save_audio(self, filename_prefix, format="flac", audio=None, quality="128k", prompt=None, extra_pnginfo=None):
+        empty = {"ui": {"audio": []}, "result": ("", [])}
         # 检查音频是否有效
         if audio is None:
             print("[SaveAudioGetPath] 警告：音频输入为空，跳过保存")
-            return {"ui": {"audio": []}, "result": ("",)}
+            return empty
         
         # 检查音频数据是否有效
         try:
             if "waveform" not in audio or audio["waveform"] is None:
                 print("[SaveAudioGetPath] 警告：音频数据无效（无 waveform），跳过保存")
-                return {"ui": {"audio": []}, "result": ("",)}
+                return empty
             
             if audio["waveform"].numel() == 0:
                 print("[SaveAudioGetPath] 警告：音频数据为空，跳过保存")
-                return {"ui": {"audio": []}, "result": ("",)}
+                return empty
         except Exception as e:
             print(f"[SaveAudioGetPath] 警告：检查音频数据时出错 ({e})，跳过保存")
-            return {"ui": {"audio": []}, "result": ("",)}
-        
-        import json
-        from io import BytesIO
-        import av
+            return empty
         
-        try:
-            import torchaudio
-            TORCH_AUDIO_AVAILABLE = True
-        except:
-            TORCH_AUDIO_AVAILABLE = False
+        if av is None:
+            print("[SaveAudioGetPath] 警告：PyAV 不可用，跳过保存")
+            return empty
         
         try:
             output_dir = folder_paths.get_output_directory()
-            full_output_folder, filename, counter, subfolder, _ = folder_paths.get_save_image_path(
-                filename_prefix, output_dir
+            full_output_folder, filename, counter, subfolder, _ = get_save_path(
+                filename_prefix, output_dir, count=len(audio["waveform"]), suffix=f"_.{format}"
             )
             
             # 构建元数据
@@ -370,12 +503,8 @@ class LG_SaveAudioGetPath:
                     for x in extra_pnginfo:
                         metadata[x] = json.dumps(extra_pnginfo[x])
             
-            # Opus 支持的采样率
-            OPUS_RATES = [8000, 12000, 16000, 24000, 48000]
-            
-            results = []
-            file_paths = []
-            
+            # 分配文件名，跳过空的批次
+            jobs = []
             for batch_number, waveform in enumerate(audio["waveform"].cpu()):
                 # 检查单个 waveform 是否有效
                 if waveform.numel() == 0:
@@ -384,79 +513,66 @@ class LG_SaveAudioGetPath:
                 
                 filename_with_batch_num = filename.replace("%batch_num%", str(batch_number))
                 file = f"{filename_with_batch_num}_{counter:05}_.{format}"
-                output_path = os.path.join(full_output_folder, file)
-                
-                sample_rate = audio["sample_rate"]
-                
-                # 处理 Opus 采样率要求
-                if format == "opus":
-                    if sample_rate > 48000:
-                        sample_rate = 48000
-                    elif sample_rate not in OPUS_RATES:
-                        for rate in sorted(OPUS_RATES):
-                            if rate > sample_rate:
-                                sample_rate = rate
-                                break
-                        if sample_rate not in OPUS_RATES:
-                            sample_rate = 48000
-                    
-                    # 重采样
-                    if sample_rate != audio["sample_rate"]:
-                        if not TORCH_AUDIO_AVAILABLE:
-                            print("[SaveAudioGetPath] 警告：torchaudio 不可用，无法重采样，跳过保存")
-                            return {"ui": {"audio": []}, "result": ("",)}
-                        waveform = torchaudio.functional.resample(waveform, audio["sample_rate"], sample_rate)
-                
-                # 创建输出
-                output_buffer = BytesIO()
-                output_container = av.open(output_buffer, mode="w", format=format)
-                
-                # 设置元数据
-                for key, value in metadata.items():
-                    output_container.metadata[key] = value
-                
-                layout = "mono" if waveform.shape[0] == 1 else "stereo"
-                
-                # 设置输出流
-                if format == "opus":
-                    out_stream = output_container.add_stream("libopus", rate=sample_rate, layout=layout)
-                    bit_rates = {"64k": 64000, "96k": 96000, "128k": 128000, "192k": 192000, "320k": 320000}
-                    out_stream.bit_rate = bit_rates.get(quality, 128000)
-                elif format == "mp3":
-                    out_stream = output_container.add_stream("libmp3lame", rate=sample_rate, layout=layout)
-                    if quality == "V0":
-                        out_stream.codec_context.qscale = 1
-                    else:
-                        bit_rates = {"64k": 64000, "96k": 96000, "128k": 128000, "192k": 192000, "320k": 320000}
-                        out_stream.bit_rate = bit_rates.get(quality, 128000)
-                else:  # flac
-                    out_stream = output_container.add_stream("flac", rate=sample_rate, layout=layout)
-                
-                frame = av.AudioFrame.from_ndarray(
-                    waveform.movedim(0, 1).reshape(1, -1).float().numpy(),
-                    format="flt",
-                    layout=layout,
-                )
-                frame.sample_rate = sample_rate
-                frame.pts = 0
-                output_container.mux(out_stream.encode(frame))
-                output_container.mux(out_stream.encode(None))  # Flush
-                output_container.close()
-                
-                # 写入文件
-                output_buffer.seek(0)
-                with open(output_path, "wb") as f:
-                    f.write(output_buffer.getbuffer())
-                
-                results.append({"filename": file, "subfolder": subfolder, "type": "output"})
-                file_paths.append(output_path)
+                jobs.append((waveform, file))
                 counter += 1
             
-            # 返回第一个文件的路径（通常只有一个）
-            return {"ui": {"audio": results}, "result": (file_paths[0] if file_paths else "",)}
+            def encode(job):
+                waveform, file = job
+                _encode_audio_file(waveform, audio["sample_rate"], os.path.join(full_output_folder, file),
+                                   format, quality, metadata)
+                return file
+            
+            # 各批次并行编码，直接写入目标文件
+            if len(jobs) > 1:
+                with ThreadPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+                    files = list(pool.map(encode, jobs))
+            else:
+                files = [encode(job) for job in jobs]
+            
+            results = [{"filename": file, "subfolder": subfolder, "type": "output"} for file in files]
+            file_paths = [os.path.join(full_output_folder, file) for file in files]
+            
+            # file_path 为第一个文件（通常只有一个），file_paths 为全部文件
+            return {"ui": {"audio": results}, "result": (file_paths[0] if file_paths else "", file_paths)}
         
         except Exception as e:
             print(f"[SaveAudioGetPath] 警告：保存音频时出错 ({e})，返回空路径")
-            return {"ui": {"audio": []}, "result": ("",)}
+            return empty
 
 
+class LG_FinalizeVideoStream:
+    """
+    结束 LG_CreateAndSaveVideo 在 stream 模式下的编码会话并写出文件
+    用于循环次数不确定、无法在最后一批使用 stream_finalize 的场景
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "filename_prefix": ("STRING", {"default": "video/segment",
+                    "tooltip": "与 LG_CreateAndSaveVideo 的 filename_prefix 一致"}),
+            },
+            "optional": {
+                "signal_opt": (any_typ,),
+            }
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("file_path",)
+    OUTPUT_NODE = True
+    FUNCTION = "finalize"
+    CATEGORY = CATEGORY_TYPE
+    DESCRIPTION = "结束流式视频编码会话，返回视频路径"
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        return float("NaN")
+
+    def finalize(self, filename_prefix, signal_opt=None):
+        file_path = close_stream_session(filename_prefix)
+        if file_path is None:
+            print(f"[FinalizeVideoStream] 警告：没有名为 {filename_prefix} 的编码会话")
+            return ("",)
+        print(f"[FinalizeVideoStream] 编码会话 {filename_prefix} 完成: {file_path}")
+        return (file_path,)
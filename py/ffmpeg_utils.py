@@ -0,0 +1,742 @@
+"""
+FFmpeg 工具
+1. FrameStreamEncoder: 把图像批次以 rawvideo 通过管道写入常驻的 ffmpeg 进程，
+   可跨多次执行追加帧，显式结束时才封装成文件，内存峰值只有一个批次
+2. 流式编码会话按 filename_prefix 管理，供 LG_CreateAndSaveVideo 的 stream 模式使用
+3. encode_segments: 把帧分成 N 段，由 N 个 ffmpeg 进程并行编码，再以流复制拼接
+4. 编码配置：default 与原先的 libx264 参数一致，fast_draft 用于快速预览，custom 使用自定义参数
+5. concat_command: LG_ConcatVideoFiles 的单次 ffmpeg 命令（拼接、替换/混合音频一次完成）
+6. 拼接兼容性检查：ffprobe 结果按 (路径, 修改时间, 大小) 缓存，只重新编码与多数片段参数不一致的片段
+7. run_ffmpeg: 统一运行 ffmpeg，解析 -progress 输出更新节点进度条，响应 ComfyUI 中断，日志只保留最后若干行
+8. append_to_ts: 增量拼接，把新片段转为 MPEG-TS 并追加到持续增长的中间文件，结束时再封装为 MP4；
+   追加的片段先按第一个片段的参数集转换（conform_segments），保证最终流复制封装后仍可解码
+FFmpeg / FFprobe 可执行文件路径可通过环境变量 LG_FFMPEG_PATH / LG_FFPROBE_PATH 覆盖
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import torch
+import comfy.model_management
+from comfy.utils import ProgressBar
+
+FFMPEG = os.environ.get("LG_FFMPEG_PATH", "ffmpeg")
+FFPROBE = os.environ.get("LG_FFPROBE_PATH", "ffprobe")
+
+# 每次转换并写入管道的帧数，限制 uint8 中间数据的大小
+WRITE_CHUNK_FRAMES = 16
+
+# ffmpeg 日志保留的行数
+LOG_LINES = 200
+
+X264_PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"]
+X264_TUNES = ["none", "film", "animation", "grain", "stillimage", "fastdecode", "zerolatency"]
+
+ENCODER_PROFILES = {
+    "default": {"preset": "medium", "crf": 23, "tune": "none", "faststart": True},
+    # 预览用：最快的预设，画质换速度，且不做 faststart（省去移动 moov 的第二遍写入）
+    "fast_draft": {"preset": "ultrafast", "crf": 28, "tune": "none", "faststart": False},
+}
+ENCODER_PROFILE_NAMES = list(ENCODER_PROFILES) + ["custom"]
+
+
+def encoder_input_types():
+    """视频节点共用的编码参数输入"""
+    return {
+        "encoder_profile": (ENCODER_PROFILE_NAMES, {"default": "default",
+            "tooltip": "default=原有参数(medium, crf 23)，fast_draft=快速预览(ultrafast, crf 28)，custom=使用下方参数"}),
+        "preset": (X264_PRESETS, {"default": "medium", "tooltip": "libx264 预设，仅 custom 生效"}),
+        "crf": ("INT", {"default": 23, "min": 0, "max": 51, "step": 1,
+            "tooltip": "质量，数值越小画质越高、文件越大，仅 custom 生效"}),
+        "tune": (X264_TUNES, {"default": "none", "tooltip": "libx264 tune，仅 custom 生效"}),
+        "threads": ("INT", {"default": 0, "min": 0, "max": 256, "step": 1,
+            "tooltip": "编码线程数，0 表示自动"}),
+    }
+
+
+def resolve_encoder(encoder_profile="default", preset="medium", crf=23, tune="none", threads=0):
+    """把节点输入解析为编码设置"""
+    if encoder_profile in ENCODER_PROFILES:
+        settings = dict(ENCODER_PROFILES[encoder_profile])
+    else:
+        settings = {"preset": preset, "crf": crf, "tune": tune, "faststart": True}
+    settings["threads"] = threads
+    settings["profile"] = encoder_profile
+    return settings
+
+
+def video_codec_args(settings=None, threads=None, codec="libx264"):
+    """libx264/libx265 编码参数，threads 不为 None 时覆盖设置中的线程数；tune 只对 libx264 生效"""
+    settings = settings or resolve_encoder()
+    threads = settings["threads"] if threads is None else threads
+    cmd = ['-c:v', codec, '-preset', settings["preset"], '-crf', str(settings["crf"])]
+    if settings["tune"] != "none" and codec == "libx264":
+        cmd.extend(['-tune', settings["tune"]])
+    if threads:
+        cmd.extend(['-threads', str(threads)])
+    return cmd
+
+
+def faststart_flag(settings=None):
+    return "+faststart" if (settings or resolve_encoder())["faststart"] else ""
+
+
+def _drain(stream, buffer):
+    """在后台线程读取子进程输出，只保留最后若干行，避免管道写满阻塞 ffmpeg"""
+    for line in iter(stream.readline, b""):
+        buffer.append(line.decode("utf-8", errors="replace").rstrip())
+    stream.close()
+
+
+def run_ffmpeg(cmd, duration=None, label="FFmpeg", output_path=None):
+    """
+    运行 ffmpeg 命令并报告进度
+
+    Args:
+        cmd: 完整命令，第一个元素为 ffmpeg 可执行文件
+        duration: 输出的预计时长（秒），提供时按 -progress 的 out_time 更新进度条
+        label: 出错时错误信息的前缀
+        output_path: 失败或被中断时删除的输出文件
+    """
+    cmd = [cmd[0], '-progress', 'pipe:1', '-nostats', *cmd[1:]]
+    log = deque(maxlen=LOG_LINES)
+    progress = {"out_time": 0.0}
+    pbar = ProgressBar(100) if duration else None
+
+    def read_progress(stream):
+        for line in iter(stream.readline, b""):
+            key, _, value = line.decode("utf-8", errors="replace").strip().partition("=")
+            # out_time_us 在各版本中都是微秒（out_time_ms 实际也是微秒）
+            if key == "out_time_us" and value.lstrip("-").isdigit():
+                progress["out_time"] = int(value) / 1_000_000
+        stream.close()
+
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    readers = [
+        threading.Thread(target=read_progress, args=(process.stdout,), daemon=True),
+        threading.Thread(target=_drain, args=(process.stderr, log), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    reported = -1
+    try:
+        while True:
+            try:
+                process.wait(timeout=0.2)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if comfy.model_management.processing_interrupted():
+                process.kill()
+                process.wait()
+                if output_path:
+                    _remove(output_path)
+                comfy.model_management.throw_exception_if_processing_interrupted()
+            if pbar is not None:
+                percent = min(99, int(progress["out_time"] * 100 / duration))
+                if percent != reported:
+                    pbar.update_absolute(percent, 100)
+                    reported = percent
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        for reader in readers:
+            reader.join()
+
+    if process.returncode != 0:
+        if output_path:
+            _remove(output_path)
+        raise RuntimeError(f"{label} 错误:\n" + "\n".join(log))
+    if pbar is not None:
+        pbar.update_absolute(100, 100)
+
+
+def frames_to_bytes(images):
+    """IMAGE 张量 [B,H,W,C] (0~1 浮点) 转为 rgb24 原始字节"""
+    frames = images[..., :3]
+    return (frames.clamp(0, 1) * 255.0).round_().to(torch.uint8).cpu().numpy().tobytes()
+
+
+def _ffmetadata_escape(text):
+    for ch in ("\\", "=", ";", "#", "\n"):
+        text = text.replace(ch, "\\" + ch)
+    return text
+
+
+def write_metadata_file(metadata):
+    """
+    把元数据写成 ffmetadata 文件，返回路径，无元数据时返回 None
+    工作流 JSON 可能有数百 KB，放进命令行会超出参数长度限制（Linux 单个参数约 128 KB，Windows 整行 32K 字符）
+    """
+    if not metadata:
+        return None
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".ffmeta", encoding="utf-8", delete=False) as f:
+        f.write(";FFMETADATA1\n")
+        for key, value in metadata.items():
+            f.write(f"{_ffmetadata_escape(str(key))}={_ffmetadata_escape(json.dumps(value))}\n")
+        return f.name
+
+
+def metadata_args(metadata_file, input_index, movflags=""):
+    """
+    元数据参数，返回 (输入参数, 输出参数)
+    输入参数需放在其他输入之后，input_index 为该元数据输入的序号；
+    mp4 需要 use_metadata_tags 才会写入自定义键，movflags 为需要一并设置的其他标志
+    """
+    if not metadata_file:
+        return [], (["-movflags", movflags] if movflags else [])
+    return (
+        ["-f", "ffmetadata", "-i", metadata_file],
+        ["-map_metadata", str(input_index), "-movflags", movflags + "+use_metadata_tags"],
+    )
+
+
+class FrameStreamEncoder:
+    """
+    常驻 ffmpeg 编码进程，帧通过 stdin 以 rgb24 写入
+
+    Args:
+        output_path: 最终输出的视频文件
+        width, height: 帧尺寸，所有批次必须一致
+        fps: 帧率
+        metadata: 写入容器的元数据
+        encoder: resolve_encoder 返回的编码设置，None 为默认
+        threads: libx264 线程数，None 表示使用编码设置中的值
+    """
+
+    def __init__(self, output_path, width, height, fps, metadata=None, encoder=None, threads=None):
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.encoder = encoder or resolve_encoder()
+        self.frames = 0
+        self._audio = []
+        self._audio_rate = None
+        self._log = deque(maxlen=LOG_LINES)
+
+        # 先编码到临时文件，结束时再加入音频并移动到最终位置
+        fd, self._video_path = tempfile.mkstemp(suffix=".mp4", dir=os.path.dirname(output_path) or None)
+        os.close(fd)
+        self._metadata_file = write_metadata_file(metadata)
+        meta_in, meta_out = metadata_args(self._metadata_file, 1, faststart_flag(self.encoder))
+        cmd = [
+            FFMPEG, '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-r', str(fps),
+            '-i', '-',
+            *meta_in,
+            '-map', '0:v',
+            # yuv420p 要求宽高为偶数
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+            *video_codec_args(self.encoder, threads), '-pix_fmt', 'yuv420p',
+            *meta_out,
+            self._video_path,
+        ]
+        try:
+            self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError:
+            self._cleanup_metadata()
+            raise
+        self._reader = threading.Thread(target=_drain, args=(self._process.stderr, self._log), daemon=True)
+        self._reader.start()
+
+    @property
+    def alive(self):
+        return self._process.poll() is None
+
+    def error_log(self):
+        return "\n".join(self._log)
+
+    def write(self, images, audio=None):
+        """追加一批帧，可附带这一批对应的音频"""
+        if images.shape[2] != self.width or images.shape[1] != self.height:
+            raise ValueError(
+                f"帧尺寸 {images.shape[2]}x{images.shape[1]} 与编码会话 {self.width}x{self.height} 不一致"
+            )
+        try:
+            for start in range(0, images.shape[0], WRITE_CHUNK_FRAMES):
+                if comfy.model_management.processing_interrupted():
+                    self.abort()
+                    comfy.model_management.throw_exception_if_processing_interrupted()
+                self._process.stdin.write(frames_to_bytes(images[start:start + WRITE_CHUNK_FRAMES]))
+        except (BrokenPipeError, OSError):
+            self.abort()
+            raise RuntimeError(f"FFmpeg 编码进程已退出:\n{self.error_log()}")
+        self.frames += images.shape[0]
+
+        if audio is not None and audio.get("waveform") is not None:
+            if self._audio_rate is not None and audio["sample_rate"] != self._audio_rate:
+                raise ValueError(f"音频采样率 {audio['sample_rate']} 与编码会话 {self._audio_rate} 不一致")
+            self._audio_rate = audio["sample_rate"]
+            # 只保留第一个批次的音频，[channels, samples]
+            self._audio.append(audio["waveform"][0].float().cpu())
+
+    def close(self):
+        """结束编码，返回输出路径"""
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        self._process.wait()
+        self._reader.join()
+        self._cleanup_metadata()
+        if self._process.returncode != 0:
+            _remove(self._video_path)
+            raise RuntimeError(f"FFmpeg 编码错误:\n{self.error_log()}")
+
+        if self._audio:
+            try:
+                mux_audio(self._video_path, torch.cat(self._audio, dim=1), self._audio_rate, self.output_path,
+                          faststart_flag(self.encoder))
+            finally:
+                _remove(self._video_path)
+        else:
+            os.replace(self._video_path, self.output_path)
+        return self.output_path
+
+    def abort(self):
+        """放弃编码并删除临时文件"""
+        if self.alive:
+            self._process.kill()
+        self._process.wait()
+        _remove(self._video_path)
+        self._cleanup_metadata()
+
+    def _cleanup_metadata(self):
+        if self._metadata_file:
+            _remove(self._metadata_file)
+            self._metadata_file = None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def mux_audio(video_path, waveform, sample_rate, output_path, movflags="+faststart"):
+    """把 [channels, samples] 的音频编码为 AAC 并与视频（流复制）合并到 output_path"""
+    channels = waveform.shape[0]
+    fd, audio_path = tempfile.mkstemp(suffix=".f32le")
+    with os.fdopen(fd, "wb") as f:
+        f.write(waveform.float().cpu().movedim(0, 1).contiguous().numpy().astype(np.float32).tobytes())
+    try:
+        cmd = [
+            FFMPEG, '-y', '-hide_banner', '-loglevel', 'error',
+            '-i', video_path,
+            '-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels), '-i', audio_path,
+            '-map', '0:v', '-map', '1:a',
+            '-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k',
+            '-map_metadata', '0', '-movflags', movflags + '+use_metadata_tags',
+            '-shortest',
+            output_path,
+        ]
+        run_ffmpeg(cmd, waveform.shape[1] / sample_rate, "FFmpeg 添加音频", output_path)
+    finally:
+        _remove(audio_path)
+
+
+def write_concat_list(paths):
+    """生成 concat demuxer 使用的列表文件，返回其路径"""
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+        for p in paths:
+            escaped_path = os.path.abspath(p).replace("'", "'\\''")
+            f.write(f"file '{escaped_path}'\n")
+        return f.name
+
+
+def concat_copy(paths, output_path, metadata=None, movflags="+faststart"):
+    """以流复制方式拼接编码参数一致的视频文件"""
+    concat_file = write_concat_list(paths)
+    metadata_file = write_metadata_file(metadata)
+    meta_in, meta_out = metadata_args(metadata_file, 1, movflags)
+    try:
+        cmd = [
+            FFMPEG, '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', concat_file,
+            *meta_in,
+            '-map', '0',
+            '-c', 'copy',
+            *meta_out,
+            output_path,
+        ]
+        run_ffmpeg(cmd, total_duration(paths), "FFmpeg 拼接", output_path)
+    finally:
+        _remove(concat_file)
+        if metadata_file:
+            _remove(metadata_file)
+
+
+def concat_command(concat_file, output_file, reencode=False, audio_path=None, audio_mode="replace",
+                   audio_volume=1.0, encoder=None):
+    """
+    拼接视频并可选替换/混合音频的单次 ffmpeg 命令，数据只读写一遍
+
+    Args:
+        concat_file: write_concat_list 生成的列表文件
+        reencode: False 时视频流复制，True 时按 encoder 重新编码
+        audio_path: 外部音频，replace 替换原音频，mix 与原音频混合
+    """
+    encoder = encoder or resolve_encoder()
+    video_args = video_codec_args(encoder) if reencode else ['-c:v', 'copy']
+    cmd = [FFMPEG, '-y', '-hide_banner', '-f', 'concat', '-safe', '0', '-i', concat_file]
+
+    if not audio_path:
+        if reencode:
+            cmd.extend([*video_args, '-c:a', 'aac', '-b:a', '128k'])
+        else:
+            cmd.extend(['-c', 'copy'])
+    else:
+        cmd.extend(['-i', audio_path])
+        if audio_mode == "mix":
+            cmd.extend([
+                '-filter_complex',
+                f'[0:a][1:a]amix=inputs=2:duration=first:dropout_transition=2,volume={audio_volume}[a]',
+                '-map', '0:v', '-map', '[a]',
+            ])
+        else:
+            cmd.extend(['-map', '0:v', '-map', '1:a'])
+            if audio_volume != 1.0:
+                cmd.extend(['-af', f'volume={audio_volume}'])
+        cmd.extend([*video_args, '-c:a', 'aac', '-b:a', '128k', '-shortest'])
+        if not reencode:
+            # 流复制时 concat 输出的视频时间戳带有片段的起始偏移，不保留原时间戳会让 -shortest 提前截断几帧
+            cmd.append('-copyts')
+
+    if encoder["faststart"]:
+        cmd.extend(['-movflags', faststart_flag(encoder)])
+    cmd.append(output_file)
+    return cmd
+
+
+@lru_cache(maxsize=1024)
+def _probe(path, mtime_ns, size):
+    cmd = [
+        FFPROBE, '-v', 'error', '-show_data_hash', 'sha256',
+        '-show_entries', 'stream=codec_type,codec_name,profile,width,height,pix_fmt,r_frame_rate,time_base,'
+                         'sample_aspect_ratio,extradata_hash,sample_rate,channels:format=duration',
+        '-of', 'json', path,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"FFprobe 错误 ({path}):\n{result.stderr}")
+    info = json.loads(result.stdout)
+    streams = info.get("streams", [])
+    video = next((st for st in streams if st.get("codec_type") == "video"), None)
+    audio = next((st for st in streams if st.get("codec_type") == "audio"), None)
+    try:
+        duration = float(info.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    signature = {"video": None, "audio": None, "duration": duration}
+    if video is not None:
+        signature["video"] = tuple(video.get(k) for k in
+                                   ("codec_name", "profile", "width", "height", "pix_fmt", "r_frame_rate", "time_base",
+                                    "sample_aspect_ratio", "extradata_hash"))
+    if audio is not None:
+        signature["audio"] = (audio.get("codec_name"), int(audio.get("sample_rate", 0)), audio.get("channels"))
+    return signature
+
+
+def probe_streams(path):
+    """
+    返回文件首个视频/音频流的参数和时长：
+    video=(codec, profile, width, height, pix_fmt, frame_rate, time_base, sar, extradata_hash)，
+    audio=(codec, sample_rate, channels)，
+    duration=秒（未知时为 None）
+    结果按 (路径, 修改时间, 大小) 缓存，文件被覆盖后自动重新探测，返回的字典不要修改
+    """
+    stat = os.stat(path)
+    return _probe(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def total_duration(paths):
+    """片段总时长，用于进度显示；无法探测时返回 None"""
+    try:
+        durations = [probe_streams(p)["duration"] for p in paths]
+    except (OSError, RuntimeError, ValueError):
+        return None
+    return sum(durations) if None not in durations else None
+
+
+# 可按参考片段参数重新编码的编码器，及 ffprobe profile 到 -profile:v 的映射
+_VIDEO_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+_AUDIO_ENCODERS = {"aac": "aac", "mp3": "libmp3lame", "opus": "libopus"}
+_H264_PROFILES = {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high",
+                  "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444"}
+
+
+# 决定 SPS/PPS 的 x264 选项（x264 SEI 中的名称 -> x264-params 名称）。
+# MP4 流复制拼接后只保留第一个文件的 avcC，转换后的片段必须产生与参考片段完全相同的参数集
+_X264_HEADER_OPTIONS = {
+    "cabac": "cabac", "ref": "ref", "bframes": "bframes", "b_pyramid": "b-pyramid", "weightb": "weightb",
+    "weightp": "weightp", "8x8dct": "8x8dct", "keyint": "keyint", "intra_refresh": "intra-refresh",
+    "constrained_intra": "constrained-intra", "stitchable": "stitchable",
+    "vbv_maxrate": "vbv-maxrate", "vbv_bufsize": "vbv-bufsize",
+}
+# 这些选项取其他值时无法复现参数集
+_X264_REQUIRED = {"cqm": "0", "interlaced": "0", "nal_hrd": "none"}
+
+
+@lru_cache(maxsize=256)
+def _x264_options(path, mtime_ns, size):
+    """读取首个视频包中 x264 写入的编码选项 SEI，返回 {名称: 值}，不是 x264 编码的文件返回 None"""
+    cmd = [
+        FFMPEG, '-v', 'error', '-i', path, '-map', '0:v:0', '-c', 'copy', '-frames:v', '1',
+        '-bsf:v', 'h264_mp4toannexb', '-f', 'h264', '-',
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    start = result.stdout.find(b"x264 - core")
+    if result.returncode != 0 or start < 0:
+        return None
+    text = result.stdout[start:].split(b"\x00", 1)[0].decode("ascii", "replace")
+    if "options: " not in text:
+        return None
+    return dict(item.split("=", 1) for item in text.split("options: ", 1)[1].split() if "=" in item)
+
+
+def _reference_x264_params(path):
+    """
+    由参考片段的 x264 选项生成 x264-params，使重新编码的片段得到相同的 SPS/PPS；无法复现时返回 None
+    - pic_init_qp 由 CRF/QP 决定（ABR 为 26），因此 crf 取参考片段的值
+    - x264 会按 psy-rd/psy-trellis 调整 chroma_qp_offset，关闭 psy 后直接使用参考片段的最终值
+    """
+    stat = os.stat(path)
+    options = _x264_options(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if not options or any(options.get(k, v) != v for k, v in _X264_REQUIRED.items()):
+        return None
+    params = [f"{_X264_HEADER_OPTIONS[k]}={v}" for k, v in options.items() if k in _X264_HEADER_OPTIONS]
+    rc = options.get("rc")
+    if rc == "crf":
+        crf = options.get("crf")
+    elif rc == "cqp":
+        crf = options.get("qp")
+    else:
+        crf = "26"
+    if crf is None:
+        return None
+    params.extend([f"crf={crf}", "psy=0", f"chroma-qp-offset={options.get('chroma_qp_offset', '0')}"])
+    return ":".join(params)
+
+
+def _conform_command(path, output_path, reference, encoder, x264_params=None):
+    """把片段按参考参数重新编码，使其可以与其他片段流复制拼接"""
+    codec, profile, width, height, pix_fmt, frame_rate, time_base, sar, _ = reference["video"]
+    timescale = time_base.split("/")[1] if "/" in time_base else "90000"
+    cmd = [FFMPEG, '-y', '-hide_banner', '-loglevel', 'error', '-i', path]
+    audio = reference["audio"]
+    if audio is not None and probe_streams(path)["audio"] is None:
+        # 参考片段有音轨而此片段没有：补一条静音，保证拼接后音画同步
+        layout = "mono" if audio[2] == 1 else "stereo"
+        cmd.extend(['-f', 'lavfi', '-i', f'anullsrc=r={audio[1]}:cl={layout}', '-map', '0:v:0', '-map', '1:a:0',
+                    '-shortest'])
+    else:
+        cmd.extend(['-map', '0:v:0'] + (['-map', '0:a:0'] if audio is not None else []))
+
+    # SAR 写在 SPS 的 VUI 中，参考片段未标注时也不标注
+    sar = sar.replace(":", "/") if sar and sar not in ("0:1", "N/A") else "0"
+    cmd.extend([
+        '-vf', f'scale={width}:{height}:force_original_aspect_ratio=decrease,'
+               f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar={sar},fps={frame_rate}',
+        '-pix_fmt', pix_fmt,
+    ])
+    cmd.extend(video_codec_args(encoder, codec=_VIDEO_ENCODERS[codec]))
+    if codec == "h264" and profile in _H264_PROFILES:
+        cmd.extend(['-profile:v', _H264_PROFILES[profile]])
+    if x264_params:
+        cmd.extend(['-x264-params', x264_params])
+    cmd.extend(['-video_track_timescale', timescale])
+
+    if audio is not None:
+        cmd.extend(['-c:a', _AUDIO_ENCODERS[audio[0]], '-ar', str(audio[1]), '-ac', str(audio[2])])
+    else:
+        cmd.append('-an')
+    cmd.append(output_path)
+    return cmd
+
+
+def conform_segments(paths, work_dir, encoder=None, reference_path=None):
+    """
+    检查片段能否直接流复制拼接。以出现最多的参数组合（或 reference_path 的参数）为参考，只重新编码不一致的片段。
+    参数组合包含编码器参数集（avcC）的哈希：熵编码、参考帧数、level 等不同的片段即使尺寸相同也不能流复制拼接。
+    H.264 参考片段按其 x264 选项重新编码，转换后再比对参数集
+
+    Returns:
+        (新的路径列表, 重新编码的片段数)；无法得到与参考一致的参数集时返回 None，调用方应整体重新编码。
+        ffprobe 不可用时跳过检查，原样返回
+    """
+    encoder = encoder or resolve_encoder()
+    try:
+        signatures = [probe_streams(p) for p in paths]
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"[FFmpeg] 兼容性检查失败，跳过: {e}")
+        return list(paths), 0
+
+    keys = [(sig["video"], sig["audio"]) for sig in signatures]
+    if reference_path is not None:
+        reference_signature = probe_streams(reference_path)
+        reference_key = (reference_signature["video"], reference_signature["audio"])
+    else:
+        counts = Counter(keys)
+        # 出现次数相同时取靠前的片段
+        reference_key = max(keys, key=lambda k: (counts[k], -keys.index(k)))
+    reference = {"video": reference_key[0], "audio": reference_key[1]}
+    mismatched = [i for i, key in enumerate(keys) if key != reference_key]
+    if not mismatched:
+        return list(paths), 0
+
+    if (reference["video"] is None or reference["video"][0] not in _VIDEO_ENCODERS
+            or (reference["audio"] is not None and reference["audio"][0] not in _AUDIO_ENCODERS)):
+        return None
+
+    x264_params = None
+    if reference["video"][0] == "h264":
+        if reference_path is None:
+            reference_path = paths[keys.index(reference_key)]
+        x264_params = _reference_x264_params(reference_path)
+        if x264_params is None:
+            return None
+
+    conformed = list(paths)
+    for index in mismatched:
+        output_path = os.path.join(work_dir, f"conform_{index:04}.mp4")
+        run_ffmpeg(_conform_command(paths[index], output_path, reference, encoder, x264_params),
+                   signatures[index]["duration"], f"FFmpeg 转换片段 ({paths[index]})", output_path)
+        result = probe_streams(output_path)
+        if (result["video"], result["audio"]) != reference_key:
+            print(f"[FFmpeg] 转换后的片段参数集与参考不一致: {paths[index]}")
+            return None
+        conformed[index] = output_path
+    return conformed, len(mismatched)
+
+
+def reencode_file(path, output_path, encoder=None):
+    """按编码设置重新编码整个文件（视频 + 可选音轨），返回 output_path"""
+    encoder = encoder or resolve_encoder()
+    try:
+        duration = probe_streams(path)["duration"]
+    except (OSError, RuntimeError, ValueError):
+        duration = None
+    cmd = [
+        FFMPEG, '-y', '-hide_banner', '-loglevel', 'error', '-i', path,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        *video_codec_args(encoder), '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-b:a', '128k',
+        output_path,
+    ]
+    run_ffmpeg(cmd, duration, f"FFmpeg 重新编码 ({path})", output_path)
+    return output_path
+
+
+def append_to_ts(path, ts_path, offset=0.0, reencode=False, encoder=None):
+    """
+    把片段转为 MPEG-TS 并追加到 ts_path 末尾。MPEG-TS 可以按字节直接拼接，
+    offset 为已追加内容的总时长，使时间戳连续
+
+    Returns:
+        片段时长（秒），无法探测时为 None
+    """
+    encoder = encoder or resolve_encoder()
+    try:
+        duration = probe_streams(path)["duration"]
+    except (OSError, RuntimeError, ValueError):
+        duration = None
+
+    fd, segment_ts = tempfile.mkstemp(suffix=".ts", dir=os.path.dirname(ts_path) or None)
+    os.close(fd)
+    try:
+        cmd = [
+            FFMPEG, '-y', '-hide_banner', '-loglevel', 'error', '-i', path,
+            '-map', '0:v:0', '-map', '0:a:0?',
+            *(video_codec_args(encoder) + ['-c:a', 'aac', '-b:a', '128k'] if reencode else ['-c', 'copy']),
+            '-output_ts_offset', f'{offset:.6f}',
+            '-f', 'mpegts', segment_ts,
+        ]
+        run_ffmpeg(cmd, duration, f"FFmpeg 转换片段 ({path})", segment_ts)
+        with open(segment_ts, "rb") as src, open(ts_path, "ab") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    finally:
+        _remove(segment_ts)
+    return duration
+
+
+def encode_segments(images, output_path, fps, segments, metadata=None, audio=None, encoder=None):
+    """
+    分段并行编码：帧按顺序分成 segments 段，每段由独立的 ffmpeg 进程编码，
+    CPU 线程在各进程间均分，最后以流复制拼接并加入音频
+    """
+    encoder = encoder or resolve_encoder()
+    frame_count = images.shape[0]
+    segments = max(1, min(segments, frame_count))
+    width, height = images.shape[2], images.shape[1]
+    threads = encoder["threads"] if segments == 1 else max(1, (encoder["threads"] or os.cpu_count() or 1) // segments)
+    bounds = [frame_count * i // segments for i in range(segments + 1)]
+
+    work_dir = tempfile.mkdtemp(prefix="lg_segments_", dir=os.path.dirname(output_path) or None)
+    segment_paths = [os.path.join(work_dir, f"segment_{i:04}.mp4") for i in range(segments)]
+
+    def encode(index):
+        session = FrameStreamEncoder(segment_paths[index], width, height, fps, encoder=encoder, threads=threads)
+        try:
+            session.write(images[bounds[index]:bounds[index + 1]])
+        except Exception:
+            session.abort()
+            raise
+        return session.close()
+
+    try:
+        with ThreadPoolExecutor(max_workers=segments) as pool:
+            list(pool.map(encode, range(segments)))
+
+        has_audio = audio is not None and audio.get("waveform") is not None
+        merged = os.path.join(work_dir, "merged.mp4") if has_audio else output_path
+        concat_copy(segment_paths, merged, metadata, faststart_flag(encoder))
+        if has_audio:
+            mux_audio(merged, audio["waveform"][0], audio["sample_rate"], output_path, faststart_flag(encoder))
+    finally:
+        for path in os.listdir(work_dir):
+            _remove(os.path.join(work_dir, path))
+        os.rmdir(work_dir)
+    return output_path
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_stream_session(key):
+    with _sessions_lock:
+        return _sessions.get(key)
+
+
+def open_stream_session(key, factory):
+    """获取 key 对应的编码会话，不存在或进程已退出时用 factory 创建"""
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is not None and not session.alive:
+            print(f"[FFmpeg] 编码会话 {key} 的进程已退出，重新创建:\n{session.error_log()}")
+            session.abort()
+            session = None
+        if session is None:
+            session = factory()
+            _sessions[key] = session
+        return session
+
+
+def close_stream_session(key):
+    """结束 key 对应的编码会话，返回输出路径，会话不存在时返回 None"""
+    with _sessions_lock:
+        session = _sessions.pop(key, None)
+    if session is None:
+        return None
+    return session.close()
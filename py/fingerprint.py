@@ -0,0 +1,116 @@
+"""
+张量内容指纹
+为 IS_CHANGED 等变化检测场景提供快速、可靠的内容哈希：
+1. 直接对张量原始内存做 blake2b，不再经过 str(tensor)（慢且只包含截断的 repr）
+2. 按 (数据指针, 版本号, 形状, 步长, dtype) 缓存结果，同一张量重复检测几乎零开销
+3. 可选按步长采样，超大批量时只哈希固定字节数
+"""
+
+import hashlib
+import threading
+import weakref
+
+import torch
+
+_DIGEST_SIZE = 16
+_CACHE_MAX_ENTRIES = 256
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _cache_key(tensor, sample_bytes):
+    return (
+        tensor.device.type,
+        tensor.data_ptr(),
+        tensor._version,
+        tuple(tensor.shape),
+        tuple(tensor.stride()),
+        tensor.dtype,
+        sample_bytes,
+    )
+
+
+def _raw_bytes(tensor, sample_bytes=None):
+    """返回张量内容的 uint8 视图（必要时拷贝到 CPU / 连续内存），可按步长采样"""
+    flat = tensor.detach()
+    if flat.device.type != "cpu":
+        flat = flat.cpu()
+    flat = flat.contiguous().reshape(-1)
+    if flat.numel() == 0:
+        return b""
+
+    if sample_bytes and flat.numel() * flat.element_size() > sample_bytes:
+        # 等间隔采样元素，保证首尾都被覆盖
+        count = max(1, sample_bytes // flat.element_size())
+        step = max(1, flat.numel() // count)
+        flat = torch.cat((flat[::step], flat[-1:]))
+
+    return flat.view(torch.uint8).numpy()
+
+
+def tensor_fingerprint(tensor, sample_bytes=None):
+    """
+    计算单个张量的内容指纹（十六进制字符串）
+
+    Args:
+        tensor: 任意 dtype / device 的张量
+        sample_bytes: 为 None 时哈希全部内容；否则超过该字节数的张量只按步长采样约这么多字节
+    """
+    key = _cache_key(tensor, sample_bytes)
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            ref, digest = entry
+            # 指针可能被释放后复用，只有原张量仍存活时缓存才有效
+            if ref() is not None:
+                return digest
+            del _cache[key]
+
+    h = hashlib.blake2b(digest_size=_DIGEST_SIZE)
+    h.update(f"{tensor.dtype}|{tuple(tensor.shape)}|".encode())
+    h.update(_raw_bytes(tensor, sample_bytes))
+    digest = h.hexdigest()
+
+    with _cache_lock:
+        if len(_cache) >= _CACHE_MAX_ENTRIES:
+            # 优先丢弃已失效的条目，仍然超限则清空
+            for k in [k for k, (r, _) in _cache.items() if r() is None]:
+                del _cache[k]
+            if len(_cache) >= _CACHE_MAX_ENTRIES:
+                _cache.clear()
+        _cache[key] = (weakref.ref(tensor), digest)
+    return digest
+
+
+def fingerprint(*values, sample_bytes=None):
+    """
+    计算任意输入组合的指纹，支持张量、None、列表/元组/字典嵌套及普通标量
+
+    用法: IS_CHANGED 中直接 return fingerprint(images, masks)
+    """
+    h = hashlib.blake2b(digest_size=_DIGEST_SIZE)
+
+    def feed(value):
+        if isinstance(value, torch.Tensor):
+            h.update(b"T")
+            h.update(tensor_fingerprint(value, sample_bytes).encode())
+        elif value is None:
+            h.update(b"N")
+        elif isinstance(value, (list, tuple)):
+            h.update(f"L{len(value)}[".encode())
+            for v in value:
+                feed(v)
+            h.update(b"]")
+        elif isinstance(value, dict):
+            h.update(f"D{len(value)}{{".encode())
+            for k in sorted(value, key=str):
+                h.update(f"{k!s}=".encode())
+                feed(value[k])
+            h.update(b"}")
+        else:
+            h.update(f"{type(value).__name__}:{value!r};".encode())
+
+    for value in values:
+        feed(value)
+    return h.hexdigest()
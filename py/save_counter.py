@@ -0,0 +1,55 @@
+"""
+文件名计数器分配
+folder_paths.get_save_image_path 每次调用都会扫描目标目录来确定下一个计数器，
+输出目录文件很多时每次保存都是 O(文件数)。这里对每个前缀只扫描一次，之后在锁内原子递增。
+"""
+
+import os
+import threading
+
+import folder_paths
+
+_counters = {}
+_lock = threading.Lock()
+
+
+def _cacheable(filename_prefix):
+    # 含日期/尺寸等占位符的前缀每次解析结果可能不同，不缓存；%batch_num% 由调用方替换，不影响目录
+    return "%" not in filename_prefix.replace("%batch_num%", "")
+
+
+def get_save_path(filename_prefix, output_dir, image_width=0, image_height=0, count=1, suffix=None):
+    """
+    get_save_image_path 的缓存版本，返回值相同，并为调用方预留 count 个连续计数器
+
+    Args:
+        count: 本次要写入的文件数，返回的 counter 起的 count 个计数器归调用方所有
+        suffix: 文件名中计数器之后的部分（如 "_.mp4"），用于检测其他程序写入的同名文件，
+                发现冲突时重新扫描目录
+    """
+    if not _cacheable(filename_prefix):
+        return folder_paths.get_save_image_path(filename_prefix, output_dir, image_width, image_height)
+
+    key = (os.path.abspath(output_dir), filename_prefix)
+    with _lock:
+        entry = _counters.get(key)
+        if entry is not None and suffix is not None:
+            full_output_folder, filename, counter, _, _ = entry
+            probe = f"{filename.replace('%batch_num%', '0')}_{counter:05}{suffix}"
+            if os.path.exists(os.path.join(full_output_folder, probe)):
+                entry = None
+
+        if entry is None:
+            full_output_folder, filename, counter, subfolder, resolved_prefix = folder_paths.get_save_image_path(
+                filename_prefix, output_dir, image_width, image_height
+            )
+            if key in _counters:
+                # 目录被其他程序写入过，计数器取两者较大值
+                counter = max(counter, _counters[key][2])
+            entry = [full_output_folder, filename, counter, subfolder, resolved_prefix]
+            _counters[key] = entry
+
+        full_output_folder, filename, counter, subfolder, resolved_prefix = entry
+        entry[2] = counter + count
+        os.makedirs(full_output_folder, exist_ok=True)
+        return full_output_folder, filename, counter, subfolder, resolved_prefix
@@ -0,0 +1,137 @@
+"""
+临时文件生命周期管理
+LG_ImageSender / LG_FastPreview / LG_AccumulatePreview 写入临时目录的文件登记在这里：
+1. 引用计数：每个文件可被多个所有者（link_id / 节点）引用，所有者释放后文件才可回收
+2. 垃圾回收：未被引用的文件超过 max_age 秒后删除；总量超过 max_bytes 时从最旧的开始删除，
+   但至少保留 min_age 秒，留给接收端和浏览器读取
+3. 统计：登记文件数、字节数、已回收文件数与字节数
+配置可通过环境变量 LG_TEMP_MAX_AGE（秒）、LG_TEMP_MAX_MB、LG_TEMP_MIN_AGE（秒）覆盖
+"""
+
+import os
+import threading
+import time
+
+
+class TempFileManager:
+    def __init__(self, max_age=3600, max_bytes=4096 * 1024 * 1024, min_age=60, gc_interval=60):
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self.gc_interval = gc_interval
+        self._files = {}  # path -> {"size", "created", "owners"}
+        self._owners = {}  # owner -> set(path)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._last_gc = 0.0
+        self.files_reclaimed = 0
+        self.bytes_reclaimed = 0
+
+    def track(self, path, owner):
+        """登记文件并添加所有者引用"""
+        path = os.path.abspath(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is None:
+                entry = {"size": size, "created": time.time(), "owners": set()}
+                self._files[path] = entry
+                self._bytes += size
+            else:
+                self._bytes += size - entry["size"]
+                entry["size"] = size
+            entry["owners"].add(owner)
+            self._owners.setdefault(owner, set()).add(path)
+        self.maybe_collect()
+
+    def release(self, owner, paths=None):
+        """释放所有者对文件的引用，paths 为 None 时释放该所有者的全部文件"""
+        with self._lock:
+            owned = self._owners.get(owner)
+            if not owned:
+                return
+            targets = list(owned) if paths is None else [os.path.abspath(p) for p in paths]
+            for path in targets:
+                owned.discard(path)
+                entry = self._files.get(path)
+                if entry is not None:
+                    entry["owners"].discard(owner)
+            if not owned:
+                del self._owners[owner]
+
+    def retain(self, owner, paths):
+        """只保留所有者对 paths 的引用，其余全部释放"""
+        keep = {os.path.abspath(p) for p in paths}
+        with self._lock:
+            stale = [p for p in self._owners.get(owner, ()) if p not in keep]
+        if stale:
+            self.release(owner, stale)
+
+    def maybe_collect(self):
+        if time.time() - self._last_gc >= self.gc_interval:
+            self.collect()
+
+    def collect(self, max_age=None, max_bytes=None):
+        """回收未被引用的文件，返回本次回收的文件数和字节数"""
+        max_age = self.max_age if max_age is None else max_age
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        now = time.time()
+
+        with self._lock:
+            self._last_gc = now
+            candidates = sorted(
+                ((path, entry) for path, entry in self._files.items()
+                 if not entry["owners"] and now - entry["created"] >= self.min_age),
+                key=lambda item: item[1]["created"],
+            )
+            victims = []
+            remaining = self._bytes
+            for path, entry in candidates:
+                if now - entry["created"] >= max_age or (max_bytes and remaining > max_bytes):
+                    victims.append(path)
+                    remaining -= entry["size"]
+            for path in victims:
+                self._bytes -= self._files.pop(path)["size"]
+
+        files, nbytes = 0, 0
+        for path in victims:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                # 已被外部删除或仍被占用
+                continue
+            files += 1
+            nbytes += size
+
+        with self._lock:
+            self.files_reclaimed += files
+            self.bytes_reclaimed += nbytes
+        if files:
+            print(f"[TempFiles] 回收 {files} 个临时文件，释放 {nbytes / 1024 / 1024:.1f} MB")
+        return {"files": files, "bytes": nbytes}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files_tracked": len(self._files),
+                "bytes_tracked": self._bytes,
+                "files_referenced": sum(1 for entry in self._files.values() if entry["owners"]),
+                "owners": len(self._owners),
+                "files_reclaimed": self.files_reclaimed,
+                "bytes_reclaimed": self.bytes_reclaimed,
+                "max_age": self.max_age,
+                "max_bytes": self.max_bytes,
+                "min_age": self.min_age,
+                "last_gc": self._last_gc,
+            }
+
+
+temp_file_manager = TempFileManager(
+    max_age=float(os.environ.get("LG_TEMP_MAX_AGE", "3600")),
+    max_bytes=int(os.environ.get("LG_TEMP_MAX_MB", "4096")) * 1024 * 1024,
+    min_age=float(os.environ.get("LG_TEMP_MIN_AGE", "60")),
+)
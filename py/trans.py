@@ -7,10 +7,23 @@ from PIL import Image
 import folder_paths
 import random
 from nodes import SaveImage
+import base64
 import json
+from io import BytesIO
 from comfy.cli_args import args
 from PIL.PngImagePlugin import PngInfo
 import time
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from .fingerprint import fingerprint
+from .lru_cache import ByteLRUCache
+from .temp_files import temp_file_manager
+from .save_counter import get_save_path
+from .value_store import value_store
+from .accumulate_store import (AccumulationStore, OVERFLOW_MODES, register_accumulator,
+                               accumulator_stats, clear_accumulators)
+from aiohttp import web
 
 CATEGORY_TYPE = "🎈LAOGOU/Group"
 class AnyType(str):
@@ -23,12 +36,26 @@ class AnyType(str):
 
 any_typ = AnyType("*")
 
+def _encode_thumbnail(image, max_size):
+    """缩放到最大边长 max_size 并编码为 data URL：带透明通道用 PNG，否则 JPEG"""
+    thumbnail = image.copy()
+    thumbnail.thumbnail((max_size, max_size), Image.Resampling.BILINEAR)
+    buffer = BytesIO()
+    if thumbnail.mode == 'RGBA':
+        thumbnail.save(buffer, format="PNG", compress_level=1)
+        mime = "image/png"
+    else:
+        thumbnail.save(buffer, format="JPEG", quality=95)
+        mime = "image/jpeg"
+    return f"data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
 class LG_ImageSender:
     def __init__(self):
         self.output_dir = folder_paths.get_temp_directory()
         self.type = "temp"
         self.compress_level = 1
         self.accumulated_results = []  
+        self.temp_owner = None
         
     @classmethod
     def INPUT_TYPES(s):
@@ -42,9 +69,13 @@ class LG_ImageSender:
             },
             "optional": {
                 "masks": ("MASK", {"tooltip": "要发送的遮罩"}),
-                "signal_opt": (any_typ, {"tooltip": "信号输入，将在处理完成后原样输出"})
+                "signal_opt": (any_typ, {"tooltip": "信号输入，将在处理完成后原样输出"}),
+                "preview_transport": (["file", "websocket"], {"default": "file",
+                    "tooltip": "接收端预览方式：file=浏览器逐张请求 /view，websocket=服务端直接推送缩略图（原图仍保存在服务端）"}),
+                "thumbnail_size": ("INT", {"default": 512, "min": 64, "max": 4096, "step": 64,
+                    "tooltip": "websocket 预览缩略图的最大边长"}),
             },
-            "hidden": {"prompt": "PROMPT", "extra_pnginfo": "EXTRA_PNGINFO"},
+            "hidden": {"prompt": "PROMPT", "extra_pnginfo": "EXTRA_PNGINFO", "unique_id": "UNIQUE_ID"},
         }
 
     RETURN_TYPES = (any_typ,)
@@ -56,18 +87,31 @@ class LG_ImageSender:
     OUTPUT_NODE = True
 
     @classmethod
-    def IS_CHANGED(s, images, filename_prefix, link_id, accumulate, preview_rgba, masks=None, prompt=None, extra_pnginfo=None):
+    def IS_CHANGED(s, images, filename_prefix, link_id, accumulate, preview_rgba, masks=None, preview_transport=None, thumbnail_size=None, prompt=None, extra_pnginfo=None, unique_id=None):
         if isinstance(accumulate, list):
             accumulate = accumulate[0]
         
         if accumulate:
             return float("NaN") 
         
-        # 非积累模式下计算hash
-        hash_value = hash(str(images) + str(masks))
-        return hash_value
+        # 非积累模式下计算内容指纹
+        return fingerprint(images, masks)
+
+    def accumulator_stats(self):
+        nbytes = 0
+        for item in self.accumulated_results:
+            try:
+                nbytes += os.path.getsize(os.path.join(self.output_dir, item["filename"]))
+            except OSError:
+                pass
+        return {"count": len(self.accumulated_results), "resident_bytes": 0, "spilled_bytes": nbytes}
 
-    def save_images(self, images, filename_prefix, link_id, accumulate, preview_rgba, masks=None, prompt=None, extra_pnginfo=None):
+    def clear_accumulated(self):
+        self.accumulated_results = []
+        if self.temp_owner is not None:
+            temp_file_manager.release(self.temp_owner)
+
+    def save_images(self, images, filename_prefix, link_id, accumulate, preview_rgba, masks=None, preview_transport=None, thumbnail_size=None, prompt=None, extra_pnginfo=None, unique_id=None):
         timestamp = int(time.time() * 1000)
         results = list()
 
@@ -75,6 +119,16 @@ class LG_ImageSender:
         link_id = link_id[0] if isinstance(link_id, list) else link_id
         accumulate = accumulate[0] if isinstance(accumulate, list) else accumulate
         preview_rgba = preview_rgba[0] if isinstance(preview_rgba, list) else preview_rgba
+        unique_id = unique_id[0] if isinstance(unique_id, list) else unique_id
+        preview_transport = preview_transport[0] if isinstance(preview_transport, list) else (preview_transport or "file")
+        thumbnail_size = thumbnail_size[0] if isinstance(thumbnail_size, list) else (thumbnail_size or 512)
+        register_accumulator(unique_id, self)
+        thumbnails = []
+
+        # 临时文件按 link_id 引用计数：非累积模式下新一批图像发出后，上一批即可被回收
+        self.temp_owner = ("link", link_id)
+        if not accumulate:
+            temp_file_manager.release(self.temp_owner)
         
         for idx, image_batch in enumerate(images):
             try:
@@ -94,6 +148,12 @@ class LG_ImageSender:
                 filename = f"{filename_prefix}_{link_id}_{timestamp}_{idx}.png"
                 file_path = os.path.join(self.output_dir, filename)
                 rgba_image.save(file_path, compress_level=self.compress_level)
+                temp_file_manager.track(file_path, self.temp_owner)
+
+                if preview_transport == "websocket":
+                    # 在执行线程中缩放并编码，避免在服务端事件循环里处理原图
+                    thumbnails.append(_encode_thumbnail(rgba_image if preview_rgba else rgb_image.convert('RGB'),
+                                                        thumbnail_size))
                 
                 # 准备要发送的数据项
                 original_result = {
@@ -107,6 +167,7 @@ class LG_ImageSender:
                     preview_filename = f"{filename_prefix}_{link_id}_{timestamp}_{idx}_preview.jpg"
                     preview_path = os.path.join(self.output_dir, preview_filename)
                     rgb_image.save(preview_path, format="JPEG", quality=95)
+                    temp_file_manager.track(preview_path, self.temp_owner)
                     # 将预览图添加到UI显示结果中
                     results.append({
                         "filename": preview_filename,
@@ -143,15 +204,74 @@ class LG_ImageSender:
         
         if send_results:
             print(f"[ImageSender] 发送 {len(send_results)} 张图像")
+            preview_batch = f"{link_id}_{timestamp}"
             PromptServer.instance.send_sync("img-send", {
                 "link_id": link_id,
-                "images": send_results
+                "images": send_results,
+                # 随后的 img-preview 缩略图数量，前端据此收集预览，不再逐张请求 /view
+                "previews": len(thumbnails),
+                "preview_batch": preview_batch,
+                "append": bool(accumulate)
             })
+            # 每张缩略图带 link_id / 批次 / 序号，前端按此归属，不会与潜空间预览等其他帧混淆
+            for index, thumbnail in enumerate(thumbnails):
+                PromptServer.instance.send_sync("img-preview", {
+                    "link_id": link_id,
+                    "batch": preview_batch,
+                    "index": index,
+                    "image": thumbnail,
+                })
         if not accumulate:
             self.accumulated_results = []
         
         return { "ui": { "images": results } }
 
+_decode_pool = None
+_decode_pool_lock = threading.Lock()
+
+def _get_decode_pool():
+    """图像解码线程池（PIL 解码时会释放 GIL，多线程可并行）"""
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is None:
+            _decode_pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1),
+                                              thread_name_prefix="lg_image_decode")
+        return _decode_pool
+
+# 进程级解码缓存：同一发送端的图像被多个接收端读取、或组重复执行时不再重复解码
+# 键为 (路径, mtime, 文件大小)，文件被覆盖后自动失效；容量可通过环境变量 LG_IMAGE_CACHE_MB 设置
+# 缓存中的张量会被多个接收端共享，不能直接交给下游节点（可能被原地修改），输出前须复制
+_decoded_image_cache = ByteLRUCache(
+    max_bytes=int(os.environ.get("LG_IMAGE_CACHE_MB", "1024")) * 1024 * 1024,
+    sizeof=lambda value: sum(t.numel() * t.element_size() for t in value),
+)
+
+def _decode_received_image(img_path):
+    """读取发送端写出的图像，返回 ([1,H,W,3] 图像, [1,H,W] 遮罩)，文件不存在时返回 None"""
+    try:
+        st = os.stat(img_path)
+    except OSError:
+        print(f"[ImageReceiver] 文件不存在: {img_path}")
+        return None
+
+    cache_key = (os.path.abspath(img_path), st.st_mtime_ns, st.st_size)
+    cached = _decoded_image_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    with Image.open(img_path) as img:
+        if img.mode == 'RGBA':
+            # 直接在 uint8 数组上切片，RGB 与 Alpha 各做一次浮点转换
+            rgba = np.array(img)
+            image = torch.from_numpy(np.ascontiguousarray(rgba[..., :3])).float().div_(255.0)[None,]
+            mask = torch.from_numpy(np.ascontiguousarray(rgba[..., 3])).float().div_(-255.0).add_(1.0)[None,]
+        else:
+            image = torch.from_numpy(np.array(img.convert('RGB'))).float().div_(255.0)[None,]
+            mask = torch.zeros((1, image.shape[1], image.shape[2]), dtype=torch.float32, device="cpu")
+
+    _decoded_image_cache.put(cache_key, (image, mask))
+    return image, mask
+
 class LG_ImageReceiver:
     @classmethod
     def INPUT_TYPES(s):
@@ -159,6 +279,10 @@ class LG_ImageReceiver:
             "required": {
                 "image": ("STRING", {"default": "", "multiline": False, "tooltip": "多个文件名用逗号分隔"}),
                 "link_id": ("INT", {"default": 1, "min": 0, "max": sys.maxsize, "step": 1, "tooltip": "发送端连接ID"}),
+            },
+            "optional": {
+                "output_batch": ("BOOLEAN", {"default": False,
+                    "tooltip": "开启后尺寸一致的图像合并为一个批量张量输出，尺寸不一致时仍按列表输出"}),
             }
         }
 
@@ -169,13 +293,10 @@ class LG_ImageReceiver:
     OUTPUT_IS_LIST = (True, True)
     FUNCTION = "load_image"
 
-    def load_image(self, image, link_id):
+    def load_image(self, image, link_id, output_batch=False):
         image_files = [x.strip() for x in image.split(',') if x.strip()]
         print(f"[ImageReceiver] 加载图像: {image_files}")
         
-        output_images = []
-        output_masks = []
-        
         if not image_files:
             empty_image = torch.zeros((1, 64, 64, 3), dtype=torch.float32)
             empty_mask = torch.zeros((1, 64, 64), dtype=torch.float32)
@@ -183,45 +304,129 @@ class LG_ImageReceiver:
         
         try:
             temp_dir = folder_paths.get_temp_directory()
-            
-            for img_file in image_files:
+
+            def decode(img_file):
                 try:
-                    img_path = os.path.join(temp_dir, img_file)
-                    
-                    if not os.path.exists(img_path):
-                        print(f"[ImageReceiver] 文件不存在: {img_path}")
-                        continue
-                    
-                    img = Image.open(img_path)
-                    
-                    if img.mode == 'RGBA':
-                        r, g, b, a = img.split()
-                        rgb_image = Image.merge('RGB', (r, g, b))
-                        image = np.array(rgb_image).astype(np.float32) / 255.0
-                        image = torch.from_numpy(image)[None,]
-                        mask = np.array(a).astype(np.float32) / 255.0
-                        mask = torch.from_numpy(mask)[None,]
-                        mask = 1.0 - mask
-                    else:
-                        image = np.array(img.convert('RGB')).astype(np.float32) / 255.0
-                        image = torch.from_numpy(image)[None,]
-                        mask = torch.zeros((1, image.shape[1], image.shape[2]), dtype=torch.float32, device="cpu")
-                    
-                    output_images.append(image)
-                    output_masks.append(mask)
-                    
+                    return _decode_received_image(os.path.join(temp_dir, img_file))
                 except Exception as e:
                     print(f"[ImageReceiver] 处理文件 {img_file} 时出错: {str(e)}")
                     import traceback
                     traceback.print_exc()
-                    continue
-            
-            return (output_images, output_masks)
+                    return None
+
+            if len(image_files) == 1:
+                decoded = [decode(image_files[0])]
+            else:
+                decoded = list(_get_decode_pool().map(decode, image_files))
+            decoded = [d for d in decoded if d is not None]
+
+            output_images = [d[0] for d in decoded]
+            output_masks = [d[1] for d in decoded]
+
+            if output_batch and len(output_images) > 1:
+                if all(img.shape == output_images[0].shape for img in output_images):
+                    return ([torch.cat(output_images, dim=0)], [torch.cat(output_masks, dim=0)])
+                print("[ImageReceiver] 图像尺寸不一致，按列表输出")
+
+            # 列表输出复制缓存中的张量，避免下游的原地修改污染缓存及其他接收端（批量输出的 cat 已是副本）
+            return ([img.clone() for img in output_images], [m.clone() for m in output_masks])
 
         except Exception as e:
             print(f"[ImageReceiver] 处理图像时出错: {str(e)}")
             return ([], [])
 
+def _parse_index_spec(spec, total):
+    """
+    解析索引表达式，返回索引列表和越界项数
+    支持逗号分隔的整数（可为负数）和切片 start:stop[:step]，如 "0:100:2,-1"
+    格式错误时抛出 ValueError
+    """
+    indices = []
+    out_of_range = 0
+    for token in spec.split(','):
+        token = token.strip()
+        if not token:
+            continue
+        if ':' in token:
+            parts = [p.strip() for p in token.split(':')]
+            if len(parts) > 3:
+                raise ValueError(token)
+            start, stop, step = (int(p) if p else None for p in parts + [""] * (3 - len(parts)))
+            if step == 0:
+                raise ValueError(token)
+            indices.extend(range(*slice(start, stop, step).indices(total)))
+        else:
+            idx = int(token)
+            if idx < 0:
+                idx += total
+            if 0 <= idx < total:
+                indices.append(idx)
+            else:
+                out_of_range += 1
+    return indices, out_of_range
+
+def _select_from_batch(batch, indices):
+    """从批量张量中一次性选取，索引为等差递增时返回切片视图（零拷贝），否则使用 index_select"""
+    if len(indices) == 1:
+        return batch[indices[0]:indices[0] + 1]
+    step = indices[1] - indices[0]
+    if step > 0 and all(b - a == step for a, b in zip(indices, indices[1:])):
+        return batch[indices[0]:indices[-1] + 1:step]
+    return batch.index_select(0, torch.tensor(indices, dtype=torch.long, device=batch.device))
+
+def _split_list_input(items, indices_spec, output_batch, batch_ndim, tag, noun):
+    """ImageListSplitter / MaskListSplitter 的公共实现"""
+    if isinstance(indices_spec, list):
+        indices_spec = indices_spec[0] if indices_spec else ""
+    if isinstance(output_batch, list):
+        output_batch = output_batch[0] if output_batch else False
+
+    # 确保输入是列表
+    if not isinstance(items, list):
+        items = [items]
+
+    if len(items) == 0:
+        print(f"[{tag}] 没有输入{noun}")
+        return ([],)
+
+    is_batch = len(items) == 1 and len(items[0].shape) == batch_ndim
+    total = items[0].shape[0] if is_batch else len(items)
+
+    try:
+        indices, out_of_range = _parse_index_spec(indices_spec, total)
+    except ValueError:
+        print(f"[{tag}] 索引格式错误，请使用逗号分隔的整数或切片，如：0,1,3 或 0:100:2,-1")
+        return ([],)
+
+    if out_of_range:
+        print(f"[{tag}] {out_of_range} 个索引超出范围 0-{total-1}，已忽略")
+    if not indices:
+        return ([],)
+
+    if is_batch:
+        # 批量输入：一次性选取，再按需拆成 [1, ...] 视图列表
+        selected = _select_from_batch(items[0], indices)
+        print(f"[{tag}] 从批量({total})中选择 {len(indices)} 个{noun}")
+        return ([selected],) if output_batch else (list(selected.split(1)),)
+
+    selected = []
+    for idx in indices:
+        item = items[idx]
+        # 确保输出带批次维度
+        if len(item.shape) == batch_ndim - 1:
+            item = item.unsqueeze(0)
+        elif len(item.shape) != batch_ndim:
+            print(f"[{tag}] 不支持的{noun}维度: {item.shape}")
+            continue
+        selected.append(item)
+    print(f"[{tag}] 从列表({total})中选择 {len(selected)} 个{noun}")
+
+    if output_batch and len(selected) > 1:
+        if all(item.shape[1:] == selected[0].shape[1:] for item in selected):
+            return ([torch.cat(selected, dim=0)],)
+        print(f"[{tag}] {noun}尺寸不一致，按列表输出")
+    return (selected,)
+
 class ImageListSplitter:
     @classmethod
     def INPUT_TYPES(cls):
@@ -231,9 +436,13 @@ class ImageListSplitter:
                 "indices": ("STRING", {
                     "default": "", 
                     "multiline": False,
-                    "tooltip": "输入要提取的图片索引，用逗号分隔，如：0,1,3,4"
+                    "tooltip": "要提取的图片索引，逗号分隔，支持负数和切片，如：0,1,3,4 或 0:100:2,-1"
                 }),
             },
+            "optional": {
+                "output_batch": ("BOOLEAN", {"default": False,
+                    "tooltip": "开启后输出单个批量张量，而不是 [1,H,W,C] 列表"}),
+            },
         }
     
     RETURN_TYPES = ("IMAGE",)
@@ -244,65 +453,9 @@ class ImageListSplitter:
     INPUT_IS_LIST = True
     OUTPUT_IS_LIST = (True,)  # (images,)
 
-    def split_images(self, images, indices):
+    def split_images(self, images, indices, output_batch=False):
         try:
-            # 解析索引字符串
-            try:
-                if isinstance(indices, list):
-                    indices = indices[0] if indices else ""
-                indices = [int(idx.strip()) for idx in indices.split(',') if idx.strip()]
-            except ValueError:
-                print("[ImageSplitter] 索引格式错误，请使用逗号分隔的数字")
-                return ([],)
-            
-            # 确保images是列表
-            if not isinstance(images, list):
-                images = [images]
-            
-            # 处理批量图片的情况
-            if len(images) == 1 and len(images[0].shape) == 4:  # [B, H, W, C]
-                batch_images = images[0]
-                total_images = batch_images.shape[0]
-                print(f"[ImageSplitter] 检测到批量图片，总数: {total_images}")
-                
-                selected_images = []
-                for idx in indices:
-                    if 0 <= idx < total_images:
-                        # 保持批次维度，使用unsqueeze确保维度为 [1, H, W, C]
-                        img = batch_images[idx].unsqueeze(0)
-                        selected_images.append(img)
-                        print(f"[ImageSplitter] 从批量中选择第 {idx} 张图片")
-                    else:
-                        print(f"[ImageSplitter] 索引 {idx} 超出批量范围 0-{total_images-1}")
-                
-                if not selected_images:
-                    return ([],)
-                return (selected_images,)
-            
-            # 处理图片列表的情况
-            total_images = len(images)
-            print(f"[ImageSplitter] 检测到图片列表，总数: {total_images}")
-            
-            if total_images == 0:
-                print("[ImageSplitter] 没有输入图片")
-                return ([],)
-            
-            selected_images = []
-            for idx in indices:
-                if 0 <= idx < total_images:
-                    selected_image = images[idx]
-                    # 确保输出维度为 [1, H, W, C]
-                    if len(selected_image.shape) == 3:  # [H, W, C]
-                        selected_image = selected_image.unsqueeze(0)
-                    selected_images.append(selected_image)
-                    print(f"[ImageSplitter] 从列表中选择第 {idx} 张图片")
-                else:
-                    print(f"[ImageSplitter] 索引 {idx} 超出列表范围 0-{total_images-1}")
-            
-            if not selected_images:
-                return ([],)
-            return (selected_images,)
-
+            return _split_list_input(images, indices, output_batch, 4, "ImageSplitter", "图片")
         except Exception as e:
             print(f"[ImageSplitter] 处理出错: {str(e)}")
             return ([],)
@@ -316,9 +469,13 @@ class MaskListSplitter:
                 "indices": ("STRING", {
                     "default": "", 
                     "multiline": False,
-                    "tooltip": "输入要提取的遮罩索引，用逗号分隔，如：0,1,3,4"
+                    "tooltip": "要提取的遮罩索引，逗号分隔，支持负数和切片，如：0,1,3,4 或 0:100:2,-1"
                 }),
             },
+            "optional": {
+                "output_batch": ("BOOLEAN", {"default": False,
+                    "tooltip": "开启后输出单个批量张量，而不是 [1,H,W] 列表"}),
+            },
         }
     
     RETURN_TYPES = ("MASK",)
@@ -329,69 +486,49 @@ class MaskListSplitter:
     INPUT_IS_LIST = True
     OUTPUT_IS_LIST = (True,)  # (masks,)
 
-    def split_masks(self, masks, indices):
+    def split_masks(self, masks, indices, output_batch=False):
         try:
-            # 解析索引字符串
-            try:
-                if isinstance(indices, list):
-                    indices = indices[0] if indices else ""
-                indices = [int(idx.strip()) for idx in indices.split(',') if idx.strip()]
-            except ValueError:
-                print("[MaskSplitter] 索引格式错误，请使用逗号分隔的数字")
-                return ([],)
-            
-            # 确保masks是列表
-            if not isinstance(masks, list):
-                masks = [masks]
-            
-            # 处理批量遮罩的情况
-            if len(masks) == 1 and len(masks[0].shape) == 3:  # [B, H, W]
-                batch_masks = masks[0]
-                total_masks = batch_masks.shape[0]
-                print(f"[MaskSplitter] 检测到批量遮罩，总数: {total_masks}")
-                
-                selected_masks = []
-                for idx in indices:
-                    if 0 <= idx < total_masks:
-                        selected_masks.append(batch_masks[idx].unsqueeze(0))
-                        print(f"[MaskSplitter] 从批量中选择第 {idx} 个遮罩")
-                    else:
-                        print(f"[MaskSplitter] 索引 {idx} 超出批量范围 0-{total_masks-1}")
-                
-                if not selected_masks:
-                    return ([],)
-                return (selected_masks,)
-            
-            # 处理遮罩列表的情况
-            total_masks = len(masks)
-            print(f"[MaskSplitter] 检测到遮罩列表，总数: {total_masks}")
-            
-            if total_masks == 0:
-                print("[MaskSplitter] 没有输入遮罩")
-                return ([],)
-            
-            selected_masks = []
-            for idx in indices:
-                if 0 <= idx < total_masks:
-                    selected_mask = masks[idx]
-                    if len(selected_mask.shape) == 2:  # [H, W]
-                        selected_mask = selected_mask.unsqueeze(0)
-                    elif len(selected_mask.shape) != 3:  # 不是 [B, H, W]
-                        print(f"[MaskSplitter] 不支持的遮罩维度: {selected_mask.shape}")
-                        continue
-                    selected_masks.append(selected_mask)
-                    print(f"[MaskSplitter] 从列表中选择第 {idx} 个遮罩")
-                else:
-                    print(f"[MaskSplitter] 索引 {idx} 超出列表范围 0-{total_masks-1}")
-            
-            if not selected_masks:
-                return ([],)
-            return (selected_masks,)
-
+            return _split_list_input(masks, indices, output_batch, 3, "MaskSplitter", "遮罩")
         except Exception as e:
             print(f"[MaskSplitter] 处理出错: {str(e)}")
             return ([],)
 
+def _repeat_list_input(items, repeat_times, output_mode, materialize, batch_ndim, tag, noun):
+    """ImageListRepeater / MaskListRepeater 的公共实现"""
+    if isinstance(repeat_times, list):
+        repeat_times = repeat_times[0] if repeat_times else 1
+    if isinstance(output_mode, list):
+        output_mode = output_mode[0] if output_mode else "list"
+    if isinstance(materialize, list):
+        materialize = materialize[0] if materialize else False
+    repeat_times = int(repeat_times)  # 确保 repeat_times 是整数
+
+    # 确保输入是列表
+    if not isinstance(items, list):
+        items = [items]
+
+    if len(items) == 0:
+        print(f"[{tag}] 没有输入{noun}")
+        return ([],)
+
+    if output_mode == "batch":
+        batches = [item.unsqueeze(0) if len(item.shape) == batch_ndim - 1 else item for item in items]
+        if all(b.shape[1:] == batches[0].shape[1:] for b in batches):
+            if len(batches) == 1 and batches[0].shape[0] == 1 and not materialize:
+                # 单张输入：expand 广播视图，不复制数据（步长为 0，下游不应原地修改）
+                result = batches[0].expand(repeat_times, *batches[0].shape[1:])
+            else:
+                source = batches[0] if len(batches) == 1 else torch.cat(batches, dim=0)
+                result = source.repeat_interleave(repeat_times, dim=0)
+            print(f"[{tag}] 输入 {len(items)} 项，输出 {result.shape[0]} 个{noun}的批量")
+            return ([result],)
+        print(f"[{tag}] {noun}尺寸不一致，按列表输出")
+
+    # 列表模式：同一张量的引用重复 repeat_times 次
+    repeated = [item for item in items for _ in range(repeat_times)]
+    print(f"[{tag}] 输入 {len(items)} 项，每项重复 {repeat_times} 次，输出 {len(repeated)} 项")
+    return (repeated,)
+
 class ImageListRepeater:
     @classmethod
     def INPUT_TYPES(cls):
@@ -401,11 +538,17 @@ class ImageListRepeater:
                 "repeat_times": ("INT", {
                     "default": 1,
                     "min": 1,
-                    "max": 100,
+                    "max": 100000,
                     "step": 1,
                     "tooltip": "每张图片重复的次数"
                 }),
             },
+            "optional": {
+                "output_mode": (["list", "batch"], {"default": "list",
+                    "tooltip": "list=输出重复后的列表，batch=输出单个批量张量"}),
+                "materialize": ("BOOLEAN", {"default": False,
+                    "tooltip": "batch 模式下强制复制数据；关闭时单张输入使用零拷贝广播视图"}),
+            },
         }
     
     RETURN_TYPES = ("IMAGE",)
@@ -416,30 +559,9 @@ class ImageListRepeater:
     INPUT_IS_LIST = True
     OUTPUT_IS_LIST = (True,)
 
-    def repeat_images(self, images, repeat_times):
+    def repeat_images(self, images, repeat_times, output_mode="list", materialize=False):
         try:
-            # 处理 repeat_times 参数
-            if isinstance(repeat_times, list):
-                repeat_times = repeat_times[0] if repeat_times else 1
-            
-            # 确保images是列表
-            if not isinstance(images, list):
-                images = [images]
-            
-            if len(images) == 0:
-                print("[ImageRepeater] 没有输入图片")
-                return ([],)
-            
-            # 创建重复后的图片列表
-            repeated_images = []
-            for idx, img in enumerate(images):
-                for _ in range(int(repeat_times)):  # 确保 repeat_times 是整数
-                    repeated_images.append(img)
-                print(f"[ImageRepeater] 图片 {idx} 重复 {repeat_times} 次")
-            
-            print(f"[ImageRepeater] 输入 {len(images)} 张图片，输出 {len(repeated_images)} 张图片")
-            return (repeated_images,)
-
+            return _repeat_list_input(images, repeat_times, output_mode, materialize, 4, "ImageRepeater", "图片")
         except Exception as e:
             print(f"[ImageRepeater] 处理出错: {str(e)}")
             return ([],)
@@ -453,11 +575,17 @@ class MaskListRepeater:
                 "repeat_times": ("INT", {
                     "default": 1,
                     "min": 1,
-                    "max": 100,
+                    "max": 100000,
                     "step": 1,
                     "tooltip": "每张遮罩重复的次数"
                 }),
             },
+            "optional": {
+                "output_mode": (["list", "batch"], {"default": "list",
+                    "tooltip": "list=输出重复后的列表，batch=输出单个批量张量"}),
+                "materialize": ("BOOLEAN", {"default": False,
+                    "tooltip": "batch 模式下强制复制数据；关闭时单张输入使用零拷贝广播视图"}),
+            },
         }
     
     RETURN_TYPES = ("MASK",)            
@@ -468,41 +596,177 @@ class MaskListRepeater:
     INPUT_IS_LIST = True
     OUTPUT_IS_LIST = (True,)    
 
-    def repeat_masks(self, masks, repeat_times):
+    def repeat_masks(self, masks, repeat_times, output_mode="list", materialize=False):
         try:
-            # 处理 repeat_times 参数
-            if isinstance(repeat_times, list):
-                repeat_times = repeat_times[0] if repeat_times else 1
+            return _repeat_list_input(masks, repeat_times, output_mode, materialize, 3, "MaskRepeater", "遮罩")
+        except Exception as e:
+            print(f"[MaskRepeater] 处理出错: {str(e)}")
+            return ([],)
 
-            # 确保masks是列表
-            if not isinstance(masks, list):
-                masks = [masks]
 
-            if len(masks) == 0:
-                print("[MaskRepeater] 没有输入遮罩")
-                return ([],)
+    
+class _ChunkSource:
+    """LG_ImageChunker 保存的分块数据源，超出内存预算的帧溢出到磁盘"""
+
+    def __init__(self, link_id, chunk_size, memory_budget):
+        spill_dir = os.path.join(folder_paths.get_temp_directory(), "lg_chunks", str(link_id))
+        self.images = AccumulationStore(spill_dir, memory_budget=memory_budget)
+        self.masks = AccumulationStore(spill_dir, memory_budget=memory_budget)
+        self.chunk_size = chunk_size
+        self.cursor = 0
+
+    @property
+    def chunk_count(self):
+        return (len(self.images) + self.chunk_size - 1) // self.chunk_size
+
+    def accumulator_stats(self):
+        image_stats = self.images.stats()
+        mask_stats = self.masks.stats()
+        return {
+            "count": image_stats["count"],
+            "resident_bytes": image_stats["resident_bytes"] + mask_stats["resident_bytes"],
+            "spilled_bytes": image_stats["spilled_bytes"] + mask_stats["spilled_bytes"],
+            "chunk_size": self.chunk_size,
+            "cursor": self.cursor,
+        }
 
-            # 创建重复后的遮罩列表
-            repeated_masks = []     
-            for idx, mask in enumerate(masks):
-                for _ in range(int(repeat_times)):  # 确保 repeat_times 是整数
-                    repeated_masks.append(mask)
-                print(f"[MaskRepeater] 遮罩 {idx} 重复 {repeat_times} 次")
+    def clear_accumulated(self):
+        self.images.clear()
+        self.masks.clear()
+        self.cursor = 0
 
-            print(f"[MaskRepeater] 输入 {len(masks)} 个遮罩，输出 {len(repeated_masks)} 个遮罩")
-            return (repeated_masks,)    
+class LG_ImageChunker:
+    """
+    把长图像列表按固定大小分块，并生成执行信号让组执行器逐块执行指定组
+    组内使用 LG_ChunkReceiver（相同 link_id）每次取出一块，峰值内存取决于块大小而不是列表长度
+    """
 
-        except Exception as e:
-            print(f"[MaskRepeater] 处理出错: {str(e)}")
-            return ([],)
+    _sources = {}  # 类级别存储，按 link_id 分组
 
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "images": ("IMAGE",),
+                "group_name": ("STRING", {"default": "", "multiline": False, "tooltip": "逐块执行的组名称"}),
+                "chunk_size": ("INT", {"default": 16, "min": 1, "max": 100000, "step": 1, "tooltip": "每块的图像数量"}),
+                "link_id": ("INT", {"default": 1, "min": 0, "max": sys.maxsize, "step": 1, "tooltip": "与 LG_ChunkReceiver 对应的连接ID"}),
+                "memory_budget_mb": ("INT", {"default": 1024, "min": 0, "max": 1048576, "step": 64,
+                    "tooltip": "分块数据的常驻内存预算(MB)，超出部分溢出到磁盘，0 表示不限制"}),
+                "delay_seconds": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 60.0, "step": 0.1}),
+            },
+            "optional": {
+                "masks": ("MASK",),
+                "signal": ("SIGNAL",),
+            },
+        }
+
+    RETURN_TYPES = ("SIGNAL", "INT", "INT")
+    RETURN_NAMES = ("signal", "chunk_count", "image_count")
+    FUNCTION = "chunk"
+    CATEGORY = CATEGORY_TYPE
+    INPUT_IS_LIST = True
+
+    def chunk(self, images, group_name, chunk_size, link_id, memory_budget_mb, delay_seconds, masks=None, signal=None):
+        group_name = group_name[0] if isinstance(group_name, list) else group_name
+        chunk_size = chunk_size[0] if isinstance(chunk_size, list) else chunk_size
+        link_id = link_id[0] if isinstance(link_id, list) else link_id
+        memory_budget_mb = memory_budget_mb[0] if isinstance(memory_budget_mb, list) else memory_budget_mb
+        delay_seconds = delay_seconds[0] if isinstance(delay_seconds, list) else delay_seconds
+        signal = signal[0] if isinstance(signal, list) and signal else signal
+
+        old = LG_ImageChunker._sources.pop(link_id, None)
+        if old is not None:
+            old.clear_accumulated()
+
+        source = _ChunkSource(link_id, chunk_size, memory_budget_mb * 1024 * 1024)
+        # 按帧存入上游张量的视图，不复制；超出预算的帧溢出到磁盘
+        for batch in images:
+            batch = batch if len(batch.shape) == 4 else batch.unsqueeze(0)
+            for frame in (batch.split(1) if batch.shape[0] else ()):
+                source.images.append(frame)
+        for batch in (masks or []):
+            batch = batch if len(batch.shape) == 3 else batch.unsqueeze(0)
+            for frame in (batch.split(1) if batch.shape[0] else ()):
+                source.masks.append(frame)
+
+        LG_ImageChunker._sources[link_id] = source
+        register_accumulator(f"chunk:{link_id}", source)
+
+        chunk_count = source.chunk_count
+        print(f"[ImageChunker] link_id={link_id}, {len(source.images)} 张图像分为 {chunk_count} 块")
+
+        current_execution = {
+            "group_name": group_name,
+            "repeat_count": chunk_count,
+            "delay_seconds": delay_seconds
+        }
+        if chunk_count == 0 or not group_name:
+            # 空信号会被 GroupExecutorSender 拒绝，repeat_count 为 0 时前端仍会执行一次，因此没有上游信号时直接报错
+            if signal is not None:
+                return (signal, chunk_count, len(source.images))
+            if chunk_count == 0:
+                raise ValueError(f"[ImageChunker] link_id={link_id} 没有可分块的图像，无法生成执行信号")
+            raise ValueError("[ImageChunker] 未指定组名称，无法生成执行信号")
+        if signal is not None:
+            if isinstance(signal, list):
+                return (signal + [current_execution], chunk_count, len(source.images))
+            return ([signal, current_execution], chunk_count, len(source.images))
+        return (current_execution, chunk_count, len(source.images))
+
+class LG_ChunkReceiver:
+    """每次执行输出 LG_ImageChunker 中下一块图像，全部取完后从头开始"""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "link_id": ("INT", {"default": 1, "min": 0, "max": sys.maxsize, "step": 1, "tooltip": "与 LG_ImageChunker 对应的连接ID"}),
+            },
+            "optional": {
+                "output_batch": ("BOOLEAN", {"default": False, "tooltip": "开启后每块输出为单个批量张量"}),
+            },
+        }
+
+    RETURN_TYPES = ("IMAGE", "MASK", "INT", "INT")
+    RETURN_NAMES = ("images", "masks", "chunk_index", "chunk_count")
+    FUNCTION = "receive"
+    CATEGORY = CATEGORY_TYPE
+    OUTPUT_IS_LIST = (True, True, False, False)
+
+    @classmethod
+    def IS_CHANGED(cls, link_id, output_batch=False):
+        return float("NaN")  # 每次执行都取下一块
+
+    def receive(self, link_id, output_batch=False):
+        source = LG_ImageChunker._sources.get(link_id)
+        if source is None or not len(source.images):
+            print(f"[ChunkReceiver] link_id={link_id} 没有可用的分块数据")
+            return ([], [], 0, 0)
+
+        chunk_count = source.chunk_count
+        index = source.cursor % chunk_count
+        source.cursor = (index + 1) % chunk_count
+
+        start = index * source.chunk_size
+        stop = start + source.chunk_size
+        images = source.images.tensors()[start:stop]
+        masks = source.masks.tensors()[start:stop]
+        print(f"[ChunkReceiver] link_id={link_id}, 输出第 {index + 1}/{chunk_count} 块 ({len(images)} 张)")
+
+        if output_batch and all(img.shape == images[0].shape for img in images):
+            images = [torch.cat(images, dim=0)]
+            if masks and all(m.shape == masks[0].shape for m in masks):
+                masks = [torch.cat(masks, dim=0)]
+        return (images, masks, index, chunk_count)
 
-    
 class LG_FastPreview(SaveImage):
     def __init__(self):
         self.output_dir = folder_paths.get_temp_directory()
         self.type = "temp"
         self.prefix_append = "_temp_" + ''.join(random.choice("abcdefghijklmnopqrstupvxyz") for x in range(5))
+        self.temp_owner = ("node", self.prefix_append)
+        weakref.finalize(self, temp_file_manager.release, self.temp_owner)
         
     @classmethod
     def INPUT_TYPES(s):
@@ -523,8 +787,14 @@ class LG_FastPreview(SaveImage):
     def save_images(self, images, format="JPEG", quality=95, prompt=None, extra_pnginfo=None):
         filename_prefix = "preview"
         filename_prefix += self.prefix_append
-        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0])
+        suffix = "_" + {"PNG": ".png", "JPEG": ".jpg"}.get(format, ".webp")
+        full_output_folder, filename, counter, subfolder, filename_prefix = get_save_path(
+            filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0], count=len(images), suffix=suffix
+        )
         
+        # 上一次的预览已被新结果替换，释放引用
+        temp_file_manager.release(self.temp_owner)
+
         results = list()
         for (batch_number, image) in enumerate(images):
             i = 255. * image.cpu().numpy()
@@ -556,6 +826,7 @@ class LG_FastPreview(SaveImage):
             file = f"{filename_with_batch_num}_{counter:05}_{file_extension}"
             
             img.save(os.path.join(full_output_folder, file), format=format, **save_kwargs)
+            temp_file_manager.track(os.path.join(full_output_folder, file), self.temp_owner)
             
             results.append({
                 "filename": file,
@@ -571,9 +842,12 @@ class LG_AccumulatePreview(SaveImage):
         self.output_dir = folder_paths.get_temp_directory()
         self.type = "temp"
         self.prefix_append = "_acc_" + ''.join(random.choice("abcdefghijklmnopqrstupvxyz") for x in range(5))
-        self.accumulated_images = []
-        self.accumulated_masks = []
+        spill_dir = os.path.join(self.output_dir, "lg_accumulate", self.prefix_append.strip("_"))
+        self.image_store = AccumulationStore(spill_dir)
+        self.mask_store = AccumulationStore(spill_dir)
         self.counter = 0
+        self.temp_owner = ("node", self.prefix_append)
+        weakref.finalize(self, temp_file_manager.release, self.temp_owner)
         
     @classmethod
     def INPUT_TYPES(s):
@@ -582,6 +856,16 @@ class LG_AccumulatePreview(SaveImage):
                 },
                 "optional": {
                     "mask": ("MASK",),
+                    "memory_budget_mb": ("INT", {"default": 0, "min": 0, "max": 1048576, "step": 64,
+                        "tooltip": "累积图像的常驻内存预算(MB)，超出后最早的图像溢出到磁盘并按需加载，0 表示不限制"}),
+                    "max_count": ("INT", {"default": 0, "min": 0, "max": 1000000, "step": 1,
+                        "tooltip": "最多保留的图像数量，0 表示不限制"}),
+                    "overflow_mode": (OVERFLOW_MODES, {"default": "ring_buffer",
+                        "tooltip": "达到数量上限后：ring_buffer=丢弃最早的图像，stop=不再累积新图像"}),
+                    "output_mode": (["list", "batch", "delta"], {"default": "list",
+                        "tooltip": "list=输出全部累积图像列表，batch=输出单个批量张量(尺寸需一致，增量扩容)，delta=只输出本次新增的图像"}),
+                    "incremental_ui": ("BOOLEAN", {"default": False,
+                        "tooltip": "开启后预览只发送本次新增的图像，前端自行追加，避免每次重发全部列表"}),
                 },
                 "hidden": {
                     "prompt": "PROMPT", 
@@ -598,68 +882,136 @@ class LG_AccumulatePreview(SaveImage):
     CATEGORY = CATEGORY_TYPE
     DESCRIPTION = "累计图像预览"
 
-    def accumulate_images(self, images, mask=None, prompt=None, extra_pnginfo=None, unique_id=None):
+    def accumulator_stats(self):
+        image_stats = self.image_store.stats()
+        mask_stats = self.mask_store.stats()
+        return {
+            "count": image_stats["count"],
+            "resident_bytes": image_stats["resident_bytes"] + mask_stats["resident_bytes"],
+            "spilled_bytes": image_stats["spilled_bytes"] + mask_stats["spilled_bytes"],
+            "images": image_stats,
+            "masks": mask_stats,
+        }
+
+    def clear_accumulated(self):
+        self.image_store.clear()
+        self.mask_store.clear()
+        temp_file_manager.release(self.temp_owner)
+
+    def accumulate_images(self, images, mask=None, memory_budget_mb=0, max_count=0, overflow_mode="ring_buffer",
+                          output_mode="list", incremental_ui=False, prompt=None, extra_pnginfo=None, unique_id=None):
         # 添加调试信息
-        print(f"[AccumulatePreview] accumulate_images - 当前累积图片数量: {len(self.accumulated_images)}")
+        print(f"[AccumulatePreview] accumulate_images - 当前累积图片数量: {len(self.image_store)}")
         print(f"[AccumulatePreview] accumulate_images - 新输入图片数量: {len(images)}")
         print(f"[AccumulatePreview] accumulate_images - unique_id: {unique_id}")
+        register_accumulator(unique_id, self)
+
+        for store in (self.image_store, self.mask_store):
+            store.configure(memory_budget=memory_budget_mb * 1024 * 1024, max_count=max_count,
+                            overflow_mode=overflow_mode, batch_mode=(output_mode == "batch"))
         
         filename_prefix = "accumulate"
         filename_prefix += self.prefix_append
 
-        full_output_folder, filename, _, subfolder, filename_prefix = folder_paths.get_save_image_path(
-            filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0]
+        # 本节点使用自己的计数器，这里只解析目录，不预留计数
+        full_output_folder, filename, _, subfolder, filename_prefix = get_save_path(
+            filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0], count=0
         )
 
+        added = 0
         for image in images:
+            if max_count and overflow_mode == "stop" and len(self.image_store) >= max_count:
+                print(f"[AccumulatePreview] 已达到数量上限 {max_count}，忽略新图像")
+                break
+
             i = 255. * image.cpu().numpy()
             img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
 
             file = f"{filename}_{self.counter:05}.png"
             img.save(os.path.join(full_output_folder, file), format="PNG")
+            temp_file_manager.track(os.path.join(full_output_folder, file), self.temp_owner)
 
             if len(image.shape) == 3:
                 image = image.unsqueeze(0) 
-            self.accumulated_images.append({
-                "image": image,
-                "info": {
-                    "filename": file,
-                    "subfolder": subfolder,
-                    "type": self.type
-                }
+            self.image_store.append(image, {
+                "filename": file,
+                "subfolder": subfolder,
+                "type": self.type
             })
 
             if mask is not None:
                 if len(mask.shape) == 2:
                     mask = mask.unsqueeze(0)
-                self.accumulated_masks.append(mask)
-            else:
-                self.accumulated_masks.append(None)
+                self.mask_store.append(mask)
             
             self.counter += 1
+            added += 1
 
-        if not self.accumulated_images:
+        if not len(self.image_store):
             return {"ui": {"images": []}, "result": ([], [], 0)}
 
-        accumulated_tensors = []
-        for item in self.accumulated_images:
-            img = item["image"]
-            if len(img.shape) == 3:  # [H, W, C]
-                img = img.unsqueeze(0)  # 变成 [1, H, W, C]
-            accumulated_tensors.append(img)
-
-        accumulated_masks = [m for m in self.accumulated_masks if m is not None]
-        
-        ui_images = [item["info"] for item in self.accumulated_images]
+        image_count = len(self.image_store)
+
+        # ring_buffer 淘汰掉的图像不再显示，释放其预览文件
+        temp_file_manager.retain(self.temp_owner, [
+            os.path.join(self.output_dir, info["subfolder"], info["filename"]) for info in self.image_store.infos()
+        ])
+
+        # 已溢出的图像是 memmap 张量，下游读取时才从磁盘分页加载
+        if output_mode == "delta":
+            accumulated_tensors = self.image_store.tensors(last=added)
+            accumulated_masks = self.mask_store.tensors(last=added if mask is not None else 0)
+        elif output_mode == "batch" and self.image_store.batch() is not None:
+            accumulated_tensors = [self.image_store.batch()]
+            mask_batch = self.mask_store.batch()
+            accumulated_masks = [mask_batch] if mask_batch is not None else self.mask_store.tensors()
+        else:
+            accumulated_tensors = self.image_store.tensors()
+            accumulated_masks = self.mask_store.tensors()
+
+        if incremental_ui:
+            ui = {
+                "images": self.image_store.infos(last=added),
+                "accumulate_count": [image_count],
+                "accumulate_delta": [True],
+            }
+        else:
+            ui = {"images": self.image_store.infos()}
         
         return {
-            "ui": {"images": ui_images},
-            "result": (accumulated_tensors, accumulated_masks, len(self.accumulated_images))
+            "ui": ui,
+            "result": (accumulated_tensors, accumulated_masks, image_count)
         }
 
+def _summarize_value(value, limit=200):
+    """生成值的简短描述，用于服务端通道模式下通知前端"""
+    if value is None:
+        return "None"
+    if isinstance(value, torch.Tensor):
+        return f"Tensor{tuple(value.shape)} {str(value.dtype).replace('torch.', '')}"
+    if isinstance(value, np.ndarray):
+        return f"ndarray{value.shape} {value.dtype}"
+    if isinstance(value, (list, tuple, dict, set)):
+        return f"{type(value).__name__}[{len(value)}]"
+    text = str(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+def _resolve_namespace(namespace):
+    """解析值存储命名空间中的占位符：%client_id% 为当前客户端，%prompt_id% 为当前任务"""
+    if "%" not in namespace:
+        return namespace
+    server = PromptServer.instance
+    namespace = namespace.replace("%client_id%", str(getattr(server, "client_id", None) or ""))
+    namespace = namespace.replace("%prompt_id%", str(getattr(server, "last_prompt_id", None) or ""))
+    return namespace
+
+NAMESPACE_TOOLTIP = "值存储的命名空间，用于隔离不同客户端/任务，支持 %client_id% 和 %prompt_id% 占位符，空为全局"
+
 class LG_ValueSender:
     """
     发送任意类型的值
+    browser 通道：转为字符串经前端填入接收端
+    server 通道：原始对象保存在服务端，接收端直接取用，前端只收到简短描述
     """
     
     @classmethod
@@ -671,6 +1023,9 @@ class LG_ValueSender:
             },
             "optional": {
                 "signal_opt": (any_typ,),
+                "channel": (["browser", "server"], {"default": "browser",
+                    "tooltip": "browser=转为文本经前端传递，server=原始对象保存在服务端，不做序列化"}),
+                "namespace": ("STRING", {"default": "", "tooltip": NAMESPACE_TOOLTIP}),
             }
         }
 
@@ -680,7 +1035,19 @@ class LG_ValueSender:
     RETURN_TYPES = (any_typ,)
     RETURN_NAMES = ("signal",)
 
-    def doit(self, value, link_id=0, signal_opt=None):
+    def doit(self, value, link_id=0, signal_opt=None, channel="browser", namespace=""):
+        if channel == "server":
+            value_store.push(_resolve_namespace(namespace), link_id, value)
+            summary = _summarize_value(value)
+            print(f"[ValueSender] link_id={link_id}, 服务端通道发送: {summary}")
+            PromptServer.instance.send_sync("value-send-summary", {
+                "link_id": link_id,
+                "namespace": namespace,
+                "type": type(value).__name__,
+                "summary": summary
+            })
+            return (signal_opt,)
+
         # 转换值为可序列化的字符串
         if value is None:
             send_value = ""
@@ -697,6 +1064,8 @@ class LG_ValueSender:
             send_value = str(value)
             
         print(f"[ValueSender] link_id={link_id}, 发送值: {send_value}")
+        # 之前走过服务端通道时切回文本，避免接收端继续使用旧的服务端对象
+        value_store.use_browser(_resolve_namespace(namespace), link_id)
         PromptServer.instance.send_sync("value-send-accumulate", {
             "link_id": link_id, 
             "value": send_value
@@ -709,20 +1078,26 @@ class LG_ValueReceiver:
     """
     接收值，支持累积模式
     累积多次收到的值成列表
+    最近一次发送走服务端通道时直接使用发送端的原始对象，忽略文本框内容
     """
     
-    _accumulated_values = {}  # 类级别存储，按 link_id 分组
-    
     @classmethod
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "typ": (["STRING", "INT", "FLOAT", "BOOLEAN", "ANY"], {"default": "STRING"}),
+                "typ": (["STRING", "INT", "FLOAT", "BOOLEAN", "ANY"], {"default": "STRING",
+                    "tooltip": "输出类型；服务端通道的非文本对象在 STRING/ANY 下原样输出"}),
                 "value": ("STRING", {"default": "", "multiline": True, 
                     "tooltip": "接收到的值，由前端自动填充"}),
                 "link_id": ("INT", {"default": 0, "min": 0, "max": sys.maxsize, "step": 1}),
                 "accumulate": ("BOOLEAN", {"default": True, "tooltip": "开启后累积所有收到的值"}),
             },
+            "optional": {
+                "dedup": ("BOOLEAN", {"default": True, "tooltip": "累积时跳过已存在的值"}),
+                "max_size": ("INT", {"default": 0, "min": 0, "max": sys.maxsize, "step": 1,
+                    "tooltip": "累积值的最大数量，超出时丢弃最旧的值，0 表示不限制"}),
+                "namespace": ("STRING", {"default": "", "tooltip": NAMESPACE_TOOLTIP}),
+            }
         }
 
     FUNCTION = "doit"
@@ -732,58 +1107,65 @@ class LG_ValueReceiver:
     OUTPUT_IS_LIST = (True, False)
 
     @classmethod
-    def IS_CHANGED(cls, typ, value, link_id, accumulate):
+    def IS_CHANGED(cls, typ, value, link_id, accumulate, dedup=True, max_size=0, namespace=""):
         if accumulate:
             return float("NaN")  # 累积模式下总是执行
-        return hash(str(value))
+        return hash((str(value), value_store.channel_version(_resolve_namespace(namespace), link_id)))
+
+    @staticmethod
+    def _convert(typ, v):
+        try:
+            if isinstance(v, str):
+                if typ == "INT":
+                    return int(v)
+                elif typ == "FLOAT":
+                    return float(v)
+                elif typ == "BOOLEAN":
+                    return v.lower() in ("true", "1", "yes")
+                return v
+            # 服务端通道的原始对象：只对标量做类型转换
+            if typ == "INT":
+                return int(v)
+            elif typ == "FLOAT":
+                return float(v)
+            elif typ == "BOOLEAN":
+                return bool(v)
+            return v
+        except (ValueError, TypeError, RuntimeError):
+            return v
+
+    def doit(self, typ, value, link_id=0, accumulate=True, dedup=True, max_size=0, namespace=""):
+        namespace = _resolve_namespace(namespace)
+        use_channel = value_store.has_channel(namespace, link_id)
 
-    def doit(self, typ, value, link_id=0, accumulate=True):
-        # 解析当前收到的值
-        current_values = [v.strip() for v in value.strip().split('\n') if v.strip()]
-        
         if accumulate:
-            # 累积模式：添加到累积列表
-            if link_id not in LG_ValueReceiver._accumulated_values:
-                LG_ValueReceiver._accumulated_values[link_id] = []
-            
-            for v in current_values:
-                if v not in LG_ValueReceiver._accumulated_values[link_id]:
-                    LG_ValueReceiver._accumulated_values[link_id].append(v)
-            
-            value_list = LG_ValueReceiver._accumulated_values[link_id].copy()
+            if use_channel:
+                # 服务端通道：直接使用原始对象
+                pending = value_store.take(namespace, link_id)
+            else:
+                # 解析当前收到的值
+                pending = [v.strip() for v in value.strip().split('\n') if v.strip()]
+            # 累积模式：新值追加到累积器，只转换新增的值
+            result = value_store.accumulate(namespace, link_id, pending, dedup, max_size, typ, self._convert)
         else:
             # 非累积模式：只使用当前值，清空累积
-            LG_ValueReceiver._accumulated_values[link_id] = []
-            value_list = current_values
+            if use_channel:
+                pending = value_store.take(namespace, link_id, keep_last=True)
+            else:
+                value_store.clear(namespace, link_id)
+                pending = [v.strip() for v in value.strip().split('\n') if v.strip()]
+            result = [self._convert(typ, v) for v in pending]
         
-        if not value_list:
+        if not result:
             return ([], 0)
         
-        # 类型转换
-        result = []
-        for v in value_list:
-            try:
-                if typ == "INT":
-                    result.append(int(v))
-                elif typ == "FLOAT":
-                    result.append(float(v))
-                elif typ == "BOOLEAN":
-                    result.append(v.lower() in ("true", "1", "yes"))
-                else:
-                    result.append(v)
-            except (ValueError, TypeError):
-                result.append(v)
-        
         print(f"[ValueReceiver] link_id={link_id}, 输出 {len(result)} 个值")
         return (result, len(result))
     
     @classmethod
-    def clear_accumulated(cls, link_id=None):
-        """清空累积的值"""
-        if link_id is None:
-            cls._accumulated_values.clear()
-        elif link_id in cls._accumulated_values:
-            cls._accumulated_values[link_id] = []
+    def clear_accumulated(cls, link_id=None, namespace=None):
+        """清空累积的值，link_id / namespace 为 None 时匹配全部"""
+        value_store.clear(namespace, link_id)
 
 
 class LG_ClearAccumulatedValues:
@@ -800,6 +1182,8 @@ class LG_ClearAccumulatedValues:
             },
             "optional": {
                 "signal_opt": (any_typ,),
+                "namespace": ("STRING", {"default": "*",
+                    "tooltip": "要清空的命名空间，* 表示全部命名空间，支持 %client_id% 和 %prompt_id% 占位符"}),
             }
         }
 
@@ -809,16 +1193,107 @@ class LG_ClearAccumulatedValues:
     RETURN_TYPES = (any_typ,)
     RETURN_NAMES = ("signal",)
 
-    def doit(self, link_id=-1, signal_opt=None):
+    def doit(self, link_id=-1, signal_opt=None, namespace="*"):
+        namespace = None if namespace == "*" else _resolve_namespace(namespace)
         if link_id < 0:
-            LG_ValueReceiver.clear_accumulated()
+            LG_ValueReceiver.clear_accumulated(namespace=namespace)
             # 通知前端清空所有
             PromptServer.instance.send_sync("value-clear-accumulate", {"link_id": -1})
             print("[ClearAccumulatedValues] 清空所有累积值")
         else:
-            LG_ValueReceiver.clear_accumulated(link_id)
+            LG_ValueReceiver.clear_accumulated(link_id, namespace)
             # 通知前端清空指定 link_id
             PromptServer.instance.send_sync("value-clear-accumulate", {"link_id": link_id})
             print(f"[ClearAccumulatedValues] 清空 link_id={link_id} 的累积值")
         
         return (signal_opt,)
+
+
+routes = PromptServer.instance.routes
+
+@routes.get("/lg/accumulators")
+async def list_accumulators(request):
+    """列出所有累积节点及其占用（条目数、常驻/溢出字节数）"""
+    try:
+        stats = accumulator_stats()
+        return web.json_response({
+            "status": "success",
+            "accumulators": stats,
+            "total_bytes": sum(s["resident_bytes"] + s["spilled_bytes"] for s in stats),
+        })
+    except Exception as e:
+        print(f"[Accumulators] 获取累积信息失败: {str(e)}")
+        return web.json_response({"status": "error", "message": str(e)}, status=500)
+
+@routes.get("/lg/accumulators/{node_id}")
+async def get_accumulator(request):
+    try:
+        node_id = request.match_info.get("node_id")
+        stats = accumulator_stats(node_id)
+        if not stats:
+            return web.json_response({"status": "error", "message": "累积节点不存在"}, status=404)
+        return web.json_response({"status": "success", "accumulator": stats[0]})
+    except Exception as e:
+        return web.json_response({"status": "error", "message": str(e)}, status=500)
+
+@routes.post("/lg/accumulators/clear")
+async def clear_accumulator(request):
+    """清空累积数据，请求体 {"node_id": "..."}，省略 node_id 时清空全部"""
+    try:
+        data = await request.json() if request.can_read_body else {}
+        node_id = data.get("node_id")
+        cleared = clear_accumulators(node_id)
+        print(f"[Accumulators] 已清空累积节点: {cleared}")
+        return web.json_response({"status": "success", "cleared": cleared})
+    except Exception as e:
+        print(f"[Accumulators] 清空累积数据失败: {str(e)}")
+        return web.json_response({"status": "error", "message": str(e)}, status=500)
+
+@routes.get("/lg/image_cache")
+async def get_image_cache_stats(request):
+    """LG_ImageReceiver 解码缓存统计（命中、淘汰、占用字节）"""
+    return web.json_response({"status": "success", "stats": _decoded_image_cache.stats()})
+
+@routes.post("/lg/image_cache/clear")
+async def clear_image_cache(request):
+    _decoded_image_cache.clear()
+    return web.json_response({"status": "success"})
+
+@routes.get("/lg/temp_files")
+async def get_temp_file_stats(request):
+    """临时文件管理统计（登记/引用/已回收的文件数与字节数）"""
+    return web.json_response({"status": "success", "stats": temp_file_manager.stats()})
+
+@routes.post("/lg/temp_files/gc")
+async def collect_temp_files(request):
+    """立即回收未被引用的临时文件，可选参数 {"max_age": 秒, "max_bytes": 字节}"""
+    try:
+        data = await request.json() if request.can_read_body else {}
+        reclaimed = temp_file_manager.collect(max_age=data.get("max_age"), max_bytes=data.get("max_bytes"))
+        return web.json_response({"status": "success", "reclaimed": reclaimed, "stats": temp_file_manager.stats()})
+    except Exception as e:
+        print(f"[TempFiles] 回收临时文件失败: {str(e)}")
+        return web.json_response({"status": "error", "message": str(e)}, status=500)
+
+@routes.get("/lg/values")
+async def get_accumulated_values(request):
+    """批量查询累积值，可选查询参数 namespace、link_id"""
+    try:
+        namespace = request.query.get("namespace")
+        link_id = request.query.get("link_id")
+        values = value_store.snapshot(namespace, int(link_id) if link_id is not None else None)
+        return web.json_response({"status": "success", "values": values})
+    except Exception as e:
+        print(f"[ValueStore] 查询累积值失败: {str(e)}")
+        return web.json_response({"status": "error", "message": str(e)}, status=500)
+
+@routes.post("/lg/values/clear")
+async def clear_accumulated_values(request):
+    """清空累积值，请求体 {"namespace": "...", "link_id": 0}，省略的字段匹配全部"""
+    try:
+        data = await request.json() if request.can_read_body else {}
+        value_store.clear(data.get("namespace"), data.get("link_id"))
+        return web.json_response({"status": "success"})
+    except Exception as e:
+        print(f"[ValueStore] 清空累积值失败: {str(e)}")
+        return web.json_response({"status": "error", "message": str(e)}, status=500)
@@ -0,0 +1,263 @@
+"""
+LG_ValueReceiver 累积值存储
+1. ValueAccumulator：按插入顺序保存值，去重为 O(1)；可限制最大数量（环形缓冲，超出时丢弃最旧的值）；
+   类型转换结果按值缓存，每次执行只转换新增的值
+2. ValueStore：按 (命名空间, link_id) 管理累积器与服务端通道，所有操作加锁；
+   命名空间用于隔离不同客户端/任务的值，默认 "" 为全局命名空间
+3. 持久化：设置环境变量 LG_VALUE_STORE_DB 为 SQLite 文件路径后，累积的值（仅限可 JSON 序列化的值）
+   写入数据库，重启后首次访问时恢复
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class ValueAccumulator:
+    """
+    单个 link_id 的累积值
+
+    Args:
+        dedup: 是否去重；不可哈希的对象（list/dict 等）始终视为新值
+        max_size: 最大保留数量，0 表示不限制
+    """
+
+    def __init__(self, dedup=True, max_size=0):
+        self.dedup = dedup
+        self.max_size = max_size
+        self._items = OrderedDict()  # key -> 原始值
+        self._converted = {}  # key -> 转换后的值
+        self._converted_typ = None
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def configure(self, dedup=True, max_size=0):
+        if dedup != self.dedup:
+            # 切换去重模式后键的含义不同，按新模式重建
+            values = list(self._items.values())
+            self.dedup = dedup
+            self._items.clear()
+            self._converted.clear()
+            self.max_size = 0
+            self.extend(values)
+        self.max_size = max_size
+        self._trim()
+
+    def _key(self, value):
+        if self.dedup:
+            try:
+                hash(value)
+                return (type(value), value)
+            except TypeError:
+                pass
+        self._seq += 1
+        return ("__seq__", self._seq)
+
+    def extend(self, values):
+        """追加值，返回实际新增的值"""
+        added = []
+        for value in values:
+            key = self._key(value)
+            if key in self._items:
+                continue
+            self._items[key] = value
+            added.append(value)
+        self._trim()
+        return added
+
+    def _trim(self):
+        if self.max_size > 0:
+            while len(self._items) > self.max_size:
+                key, _ = self._items.popitem(last=False)
+                self._converted.pop(key, None)
+
+    def values(self, typ=None, convert=None):
+        """返回全部累积值；提供 convert 时返回转换结果，已转换过的值直接复用"""
+        if convert is None:
+            return list(self._items.values())
+        if typ != self._converted_typ:
+            self._converted.clear()
+            self._converted_typ = typ
+        converted = self._converted
+        result = []
+        for key, value in self._items.items():
+            if key not in converted:
+                converted[key] = convert(typ, value)
+            result.append(converted[key])
+        return result
+
+    def clear(self):
+        self._items.clear()
+        self._converted.clear()
+
+
+def _json_value(value):
+    """返回值的 JSON 文本，不可序列化时返回 None"""
+    try:
+        return json.dumps(value, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return None
+
+
+class ValueStore:
+    """
+    线程安全的累积值存储
+
+    Args:
+        db_path: SQLite 文件路径，为空时只保存在内存中
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._accumulators = {}  # (namespace, link_id) -> ValueAccumulator
+        self._channel = {}  # (namespace, link_id) -> 待接收的原始对象
+        self._versions = {}  # (namespace, link_id) -> 通道切换/写入次数
+        self._server = set()  # 最近一次发送走服务端通道的 (namespace, link_id)
+        self._db = None
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS lg_values ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT NOT NULL, "
+                "link_id INTEGER NOT NULL, value TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS lg_values_key ON lg_values (namespace, link_id, seq)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"[ValueStore] 打开数据库失败，仅使用内存存储: {e}")
+            self._db = None
+
+    def _load(self, namespace, link_id):
+        if self._db is None:
+            return []
+        rows = self._db.execute(
+            "SELECT value FROM lg_values WHERE namespace = ? AND link_id = ? ORDER BY seq",
+            (namespace, link_id),
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _persist(self, namespace, link_id, values, max_size):
+        if self._db is None:
+            return
+        rows = [(namespace, link_id, text) for text in map(_json_value, values) if text is not None]
+        try:
+            if rows:
+                self._db.executemany("INSERT INTO lg_values (namespace, link_id, value) VALUES (?, ?, ?)", rows)
+            if max_size > 0 and values:
+                self._db.execute(
+                    "DELETE FROM lg_values WHERE namespace = ? AND link_id = ? AND seq NOT IN ("
+                    "SELECT seq FROM lg_values WHERE namespace = ? AND link_id = ? ORDER BY seq DESC LIMIT ?)",
+                    (namespace, link_id, namespace, link_id, max_size),
+                )
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"[ValueStore] 写入数据库失败: {e}")
+
+    def accumulate(self, namespace, link_id, values, dedup=True, max_size=0, typ=None, convert=None):
+        """追加值并返回全部累积值（已转换）"""
+        key = (namespace, link_id)
+        with self._lock:
+            accumulator = self._accumulators.get(key)
+            if accumulator is None:
+                accumulator = ValueAccumulator(dedup, max_size)
+                accumulator.extend(self._load(namespace, link_id))
+                self._accumulators[key] = accumulator
+            else:
+                accumulator.configure(dedup, max_size)
+            added = accumulator.extend(values)
+            self._persist(namespace, link_id, added, max_size)
+            return accumulator.values(typ, convert)
+
+    def push(self, namespace, link_id, value):
+        """服务端通道：保存发送端的原始对象，等待接收端取走"""
+        key = (namespace, link_id)
+        with self._lock:
+            self._channel.setdefault(key, []).append(value)
+            self._server.add(key)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def use_browser(self, namespace, link_id):
+        """发送端改走 browser 通道：丢弃未取走的服务端对象，接收端恢复使用文本框内容"""
+        key = (namespace, link_id)
+        with self._lock:
+            if key in self._server:
+                self._server.discard(key)
+                self._channel.pop(key, None)
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+    def has_channel(self, namespace, link_id):
+        """最近一次发送是否走服务端通道"""
+        with self._lock:
+            return (namespace, link_id) in self._server
+
+    def channel_version(self, namespace, link_id):
+        with self._lock:
+            return self._versions.get((namespace, link_id), 0)
+
+    def take(self, namespace, link_id, keep_last=False):
+        """取出服务端通道中待接收的值；keep_last 时只返回并保留最新的一个"""
+        key = (namespace, link_id)
+        with self._lock:
+            pending = self._channel.get(key, [])
+            if keep_last:
+                pending = pending[-1:]
+                self._channel[key] = pending
+            else:
+                self._channel[key] = []
+            return pending
+
+    def clear(self, namespace=None, link_id=None):
+        """清空累积值与服务端通道，namespace / link_id 为 None 时匹配全部"""
+        def match(key):
+            return (namespace is None or key[0] == namespace) and (link_id is None or key[1] == link_id)
+
+        with self._lock:
+            for table in (self._accumulators, self._channel, self._versions):
+                for key in [k for k in table if match(k)]:
+                    del table[key]
+            self._server = {k for k in self._server if not match(k)}
+            if self._db is not None:
+                clauses, params = [], []
+                if namespace is not None:
+                    clauses.append("namespace = ?")
+                    params.append(namespace)
+                if link_id is not None:
+                    clauses.append("link_id = ?")
+                    params.append(link_id)
+                where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+                try:
+                    self._db.execute(f"DELETE FROM lg_values{where}", params)
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"[ValueStore] 清空数据库失败: {e}")
+
+    def snapshot(self, namespace=None, link_id=None):
+        """导出累积值，不可 JSON 序列化的值以 repr 文本代替"""
+        result = {}
+        with self._lock:
+            keys = set(self._accumulators)
+            if self._db is not None:
+                keys.update(self._db.execute("SELECT DISTINCT namespace, link_id FROM lg_values").fetchall())
+            for key in sorted(keys):
+                ns, lid = key
+                if (namespace is not None and ns != namespace) or (link_id is not None and lid != link_id):
+                    continue
+                accumulator = self._accumulators.get(key)
+                values = accumulator.values() if accumulator is not None else self._load(ns, lid)
+                result.setdefault(ns, {})[str(lid)] = [
+                    v if _json_value(v) is not None else repr(v) for v in values
+                ]
+        return result
+
+
+value_store = ValueStore(os.environ.get("LG_VALUE_STORE_DB") or None)
@@ -16,6 +16,20 @@ app.registerExtension({
                 widget.name_in_graph = false;
             };
 
+            const onExecuted = nodeType.prototype.onExecuted;
+            nodeType.prototype.onExecuted = function(message) {
+                // 增量预览：后端只发送新增图像，这里追加到已有列表并按累积总数截断
+                if (message?.accumulate_delta?.[0]) {
+                    const count = message.accumulate_count?.[0] ?? 0;
+                    const merged = [...(this._accumulatedImages || []), ...(message.images || [])];
+                    this._accumulatedImages = count > 0 ? merged.slice(-count) : [];
+                    message.images = this._accumulatedImages;
+                } else {
+                    this._accumulatedImages = message?.images ? [...message.images] : [];
+                }
+                onExecuted?.apply(this, arguments);
+            };
+
             nodeType.prototype.onConfigure = function() {
                 if (this._configuring) {
                     return;
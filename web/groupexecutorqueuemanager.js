@@ -83,41 +83,95 @@ app.registerExtension({
 
 
 
-api.addEventListener("img-send", async ({ detail }) => {
-    if (detail.images.length === 0) return;
-
-    const filenames = detail.images.map(data => data.filename).join(', ');
-
+function forEachLinkedReceiver(linkId, callback) {
     for (const node of app.graph._nodes) {
         if (node.type === "LG_ImageReceiver") {
-            let isLinked = false;
-
             const linkWidget = node.widgets.find(w => w.name === "link_id");
-            if (linkWidget.value === detail.link_id) {
-                isLinked = true;
+            if (linkWidget?.value === linkId) {
+                callback(node);
             }
+        }
+    }
+}
+
+function loadImages(sources) {
+    return Promise.all(sources.map(src => {
+        return new Promise((resolve) => {
+            const img = new Image();
+            img.onload = () => resolve(img);
+            img.onerror = () => resolve(img);
+            img.src = src;
+        });
+    }));
+}
+
+// websocket 预览：img-send 之后服务端以 img-preview 事件逐张推送缩略图，
+// 每张带 link_id / batch / index，按批次收集；同一 link_id 出现新批次、执行开始或超时后丢弃未收齐的批次
+const PREVIEW_TIMEOUT_MS = 30000;
+const pendingPreviews = new Map();
+
+function dropPendingPreview(linkId) {
+    const pending = pendingPreviews.get(linkId);
+    if (!pending) return;
+    clearTimeout(pending.timer);
+    pendingPreviews.delete(linkId);
+}
 
-            if (isLinked) {
-                if (node.widgets[0]) {
-                    node.widgets[0].value = filenames;
-                    if (node.widgets[0].callback) {
-                        node.widgets[0].callback(filenames);
-                    }
-                }
+api.addEventListener("img-send", async ({ detail }) => {
+    if (detail.images.length === 0) return;
 
-                Promise.all(detail.images.map(imageData => {
-                    return new Promise((resolve) => {
-                        const img = new Image();
-                        img.onload = () => resolve(img);
-                        img.src = `/view?filename=${encodeURIComponent(imageData.filename)}&type=${imageData.type}${app.getPreviewFormatParam()}`;
-                    });
-                })).then(loadedImages => {
-                    node.imgs = loadedImages;
-                    app.canvas.setDirty(true);
-                });
+    const filenames = detail.images.map(data => data.filename).join(', ');
+
+    forEachLinkedReceiver(detail.link_id, (node) => {
+        if (node.widgets[0]) {
+            node.widgets[0].value = filenames;
+            if (node.widgets[0].callback) {
+                node.widgets[0].callback(filenames);
             }
         }
+    });
+
+    dropPendingPreview(detail.link_id);
+    if (detail.previews > 0) {
+        pendingPreviews.set(detail.link_id, {
+            batch: detail.preview_batch,
+            remaining: detail.previews,
+            append: detail.append,
+            urls: new Array(detail.previews),
+            timer: setTimeout(() => dropPendingPreview(detail.link_id), PREVIEW_TIMEOUT_MS)
+        });
+        return;
     }
+
+    const sources = detail.images.map(imageData =>
+        `/view?filename=${encodeURIComponent(imageData.filename)}&type=${imageData.type}${app.getPreviewFormatParam()}`
+    );
+    loadImages(sources).then(loadedImages => {
+        forEachLinkedReceiver(detail.link_id, (node) => {
+            node.imgs = loadedImages;
+        });
+        app.canvas.setDirty(true);
+    });
+});
+
+api.addEventListener("img-preview", ({ detail }) => {
+    const pending = pendingPreviews.get(detail.link_id);
+    if (!pending || pending.batch !== detail.batch || pending.urls[detail.index] !== undefined) return;
+
+    pending.urls[detail.index] = detail.image;
+    if (--pending.remaining > 0) return;
+    dropPendingPreview(detail.link_id);
+
+    loadImages(pending.urls).then(loadedImages => {
+        forEachLinkedReceiver(detail.link_id, (node) => {
+            node.imgs = pending.append ? [...(node.imgs || []), ...loadedImages] : loadedImages;
+        });
+        app.canvas.setDirty(true);
+    });
+});
+
+api.addEventListener("execution_start", () => {
+    [...pendingPreviews.keys()].forEach(dropPendingPreview);
 });
 
 app.registerExtension({
@@ -0,0 +1,60 @@
+import { app } from "../../scripts/app.js";
+import { api } from "../../scripts/api.js";
+
+// LG_ValueSender 服务端通道：原始对象留在服务端，前端只收到简短描述，显示在对应的 LG_ValueReceiver 下方
+
+function forEachValueReceiver(linkId, namespace, callback) {
+    for (const node of app.graph._nodes) {
+        if (node.type !== "LG_ValueReceiver") continue;
+        const linkWidget = node.widgets?.find(w => w.name === "link_id");
+        const namespaceWidget = node.widgets?.find(w => w.name === "namespace");
+        if (linkId !== -1 && linkWidget?.value !== linkId) continue;
+        if (namespace !== undefined && (namespaceWidget?.value ?? "") !== namespace) continue;
+        callback(node);
+    }
+}
+
+function setChannelSummary(node, summary) {
+    node._lgChannelSummary = summary;
+    node.setDirtyCanvas(true, true);
+}
+
+api.addEventListener("value-send-summary", ({ detail }) => {
+    forEachValueReceiver(detail.link_id, detail.namespace, (node) => {
+        setChannelSummary(node, `server: ${detail.type} ${detail.summary}`);
+    });
+});
+
+// browser 通道发送或清空后，服务端通道的描述不再有效
+api.addEventListener("value-send-accumulate", ({ detail }) => {
+    forEachValueReceiver(detail.link_id, undefined, (node) => setChannelSummary(node, null));
+});
+
+api.addEventListener("value-clear-accumulate", ({ detail }) => {
+    forEachValueReceiver(detail.link_id, undefined, (node) => setChannelSummary(node, null));
+});
+
+app.registerExtension({
+    name: "LG_ValueChannel",
+    async beforeRegisterNodeDef(nodeType, nodeData, app) {
+        if (nodeData.name !== "LG_ValueReceiver") return;
+
+        const onDrawForeground = nodeType.prototype.onDrawForeground;
+        nodeType.prototype.onDrawForeground = function (ctx) {
+            onDrawForeground?.apply(this, arguments);
+            if (!this._lgChannelSummary || this.flags?.collapsed) return;
+            ctx.save();
+            ctx.font = "12px sans-serif";
+            ctx.fillStyle = "#8ab4f8";
+            ctx.textAlign = "left";
+            const text = this._lgChannelSummary;
+            const maxWidth = Math.max(this.size[0] - 10, 40);
+            let shown = text;
+            while (shown.length > 1 && ctx.measureText(shown).width > maxWidth) {
+                shown = shown.slice(0, -2) + "…";
+            }
+            ctx.fillText(shown, 5, this.size[1] + 16);
+            ctx.restore();
+        };
+    },
+});